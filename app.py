@@ -2,53 +2,60 @@ import calendar
 from datetime import date, datetime, timedelta
 import enum
 from functools import cache, lru_cache
-import json
 from pathlib import Path
+import threading
+import time
 
 from bson.objectid import ObjectId
-from flask import Flask, request, redirect, url_for, render_template
-from pymongo import MongoClient
-from wtforms import Form, SelectField, SelectMultipleField, DateField, TimeField, StringField
+from flask import Flask, Response, abort, request, redirect, url_for, render_template, stream_template
+from flask.json.provider import JSONProvider
+from markupsafe import Markup
+from wtforms import Form, SelectField, SelectMultipleField, DateField, TimeField, StringField, BooleanField
 from wtforms.validators import DataRequired, Optional
 from wtforms.widgets import CheckboxInput, ListWidget
 
-from cal_utils import prepare_events, get_month_dates, next_month_first_day, weekdays_in_month
+import archive
+import codec
+from cal_utils import get_month_dates, weekdays_in_month
+from conflicts import ConflictIndex
+from event_types import EventType
+import filters
+import ical
+import layouts
+import reports
+from search import SearchIndex
+from storage import open_storage, timestamp
 
 
 DATA_DIR = 'data'
 
+# события, которые можно добавить сразу на несколько дней недели
+RECURRING_TYPES = ["practices", "practices_vtp", "yoga", "yoga_joints", "yoga_spine"]
+
+
+class CodecJSONProvider(JSONProvider):
+    """JSON ответов API через codec (orjson, если установлен)"""
+
+    def dumps(self, obj, **kwargs):
+        return codec.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return codec.loads(s)
+
+
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
+# страницы годов отдаются потоком: FLASK_STREAM_PAGES=true
+app.config['STREAM_PAGES'] = False
+# как часто подтягивать в кеши изменения, сделанные в обход процесса, и как часто строить их заново (секунды)
+app.config['CACHE_SYNC_INTERVAL'] = 5
+app.config['CACHE_TTL'] = 600
+app.config.from_prefixed_env()
 
 
 @cache
-def get_db(url='mongodb://127.0.0.1:27017/', dbname='aol_calendar'):
-    client = MongoClient(url)
-    return client[dbname]
-
-
-class EventType(enum.StrEnum):
-    first_step = "Первый шаг"
-    happiness = "Счастье"
-    art_of_meditation = "Искусство медитации"
-    cooking = "Здоровое питание"
-    art_of_silence = "Искусство тишины"
-    dsn = "DSN"
-    practices = "Поддерживающее занятие"
-    practices_vtp = "Поддерживающее занятие для VTP"
-    yoga = "Йога"
-    yoga_spine = "Йога для позвоночника"
-    yoga_joints = "Суставная йога"
-    satsang = "Песенный сатсанг"
-    premium = "Искусство жизни — Премиум"
-
-    @classmethod
-    def choices(cls, sort=True, empty_option="Не выбрано"):
-        event_types = [(et.name, et.value) for et in cls]
-        if sort:
-            event_types = sorted(event_types, key=lambda et: et[1])
-        if empty_option:
-            event_types.insert(0, ("", empty_option))
-        return event_types
+def get_storage(url=None):
+    return open_storage(url)
 
 
 class WeekDay(enum.IntEnum):
@@ -94,11 +101,7 @@ TEACHERS_CHOICES = [
 
 @lru_cache(maxsize=1)
 def get_all_teachers():
-    db = get_db()
-    events_col = db['events']
-    list_of_list_of_teachers = (event.get('teachers', []) for event in events_col.find({}, {'teachers': 1}))
-    teachers = (teacher for list_of_teachers in list_of_list_of_teachers for teacher in list_of_teachers)
-    return sorted(set(teachers))
+    return sorted(get_storage().distinct('teachers'))
 
 
 LOCATION_CHOICES = [
@@ -116,12 +119,14 @@ LOCATION_CHOICES = [
     'парк-отель «Звездный»',
 ]
 
+# отфильтрованные страницы годов: /2026-group-yoga.html, /2026-place-bolshie-koty.html
+FILTERS = filters.make_filters(LOCATION_CHOICES)
+FILTERS_BY_NAME = {f.name: f for f in FILTERS}
+
 
 @lru_cache(maxsize=1)
 def get_all_locations():
-    db = get_db()
-    events_col = db['events']
-    return sorted(set(event['place'] for event in events_col.find({}, {'place': 1})))
+    return sorted(get_storage().distinct('place'))
 
 
 class Month(enum.Enum):
@@ -171,8 +176,61 @@ class EventForm(Form):
     end_date = DateField('Дата окончания', [Optional()], name="end-date")
     schedule = MultiCheckboxField('Расписание', [Optional()], choices=WeekDay.choices(), coerce=int)
     start_time = TimeField('Время начала', [Optional()], name="start-time")
-    place = SelectField('Место', [DataRequired()], choices=get_all_locations())
-    teachers = SelectMultipleField('Учителя', [Optional()], choices=get_all_teachers())
+    # списки мест и учителей берутся из базы при первом показе формы, а не при импорте модуля
+    place = SelectField('Место', [DataRequired()], choices=get_all_locations)
+    teachers = SelectMultipleField('Учителя', [Optional()], choices=get_all_teachers)
+    # показывается, только если у события нашлись пересечения
+    force = BooleanField('Сохранить, несмотря на пересечения', name="force")
+
+
+class BulkFilterForm(Form):
+    """Отбор событий для массовых операций"""
+
+    series_id = StringField('Серия', [Optional()], name="series-id")
+    event_type = SelectField('Мероприятие', [Optional()], choices=EventType.choices(empty_option="Любое"), name="type")
+    place = SelectField('Место', [Optional()], choices=lambda: [("", "Любое")] + [(p, p) for p in get_all_locations()])
+    start_date = DateField('С даты', [Optional()], name="start-date")
+    end_date = DateField('По дату', [Optional()], name="end-date")
+    dry_run = BooleanField('Только посчитать', name="dry-run")
+
+    def criteria(self):
+        """Критерии отбора для хранилища (см. storage.Storage)"""
+
+        criteria = {
+            'series_id': self.series_id.data,
+            'type': self.event_type.data,
+            'place': self.place.data,
+        }
+        if self.start_date.data:
+            criteria['start'] = datetime.combine(self.start_date.data, datetime.min.time())
+        if self.end_date.data:
+            criteria['end'] = datetime.combine(self.end_date.data, datetime.min.time()) + timedelta(days=1)
+        return {k: v for k, v in criteria.items() if v}
+
+
+class BulkUpdateForm(BulkFilterForm):
+    new_event_type = SelectField('Новое мероприятие', [Optional()], choices=EventType.choices(empty_option="Не менять"),
+                                 name="new-type")
+    new_place = SelectField('Новое место', [Optional()],
+                            choices=lambda: [("", "Не менять")] + [(p, p) for p in get_all_locations()],
+                            name="new-place")
+    new_start_time = TimeField('Новое время начала', [Optional()], name="new-start-time")
+    new_teachers = SelectMultipleField('Новые учителя', [Optional()], choices=get_all_teachers, name="new-teachers")
+
+    def changes(self):
+        """Изменения полей событий"""
+
+        changes = {}
+        if self.new_event_type.data:
+            changes["name"] = EventType[self.new_event_type.data].value
+            changes["type"] = self.new_event_type.data
+        if self.new_place.data:
+            changes["place"] = self.new_place.data
+        if self.new_start_time.data:
+            changes["time"] = self.new_start_time.data.strftime('%H:%M')
+        if self.new_teachers.data:
+            changes["teachers"] = self.new_teachers.data
+        return changes
 
 
 def human_dates(start_date, end_date):
@@ -209,6 +267,7 @@ def make_event(form_data, **override):
         "place": data["place"],
         "start_date": datetime.combine(data["start_date"], datetime.min.time()),
         "end_date": datetime.combine(data["end_date"] or data["start_date"], datetime.min.time()),
+        "updated_at": timestamp(),
     }
 
     if data['teachers']:
@@ -222,51 +281,302 @@ def make_event(form_data, **override):
 def make_recurring_events(form_data):
     start_date = form_data['start_date']
     end_date = form_data['end_date']
+    # общий идентификатор, чтобы потом менять/удалять всю серию разом
+    series_id = str(ObjectId())
 
     for weekday in form_data['schedule']:
         for event_dt in weekdays_in_month(start_date.year, start_date.month, weekday - 1):
             if event_dt >= start_date and (event_dt <= end_date if end_date else True):
-                yield make_event(form_data, start_date=event_dt, end_date=event_dt)
+                yield make_event(form_data, start_date=event_dt, end_date=event_dt) | {'series_id': series_id}
 
 
-def add_events(events):
-    db = get_db()
-    events_col = db['events']
+feeds = ical.FeedCache(lambda: get_storage().find_range(ical.feed_start()))
+report_cache = reports.ReportCache(get_storage)
+
+
+@cache
+def _search_index():
+    index = SearchIndex()
+    index.add(get_storage().find_range())
+    return index
+
+
+@cache
+def _years():
+    return archive.discover_years(get_storage())
+
+
+@cache
+def _conflict_index():
+    index = ConflictIndex()
+    index.add(get_storage().find_range())
+    return index
+
+
+_sync_lock = threading.Lock()
+_sync_state = {'since': None, 'checked': None, 'reset': None}
+_own_changes = set()  # (_id, updated_at) событий, измененных этим процессом
+
+
+def reset_caches():
+    """Сбрасывает все, что построено из событий: при следующем обращении кеши строятся из базы"""
+
+    _sync_state['since'] = timestamp()
+    _sync_state['checked'] = _sync_state['reset'] = time.monotonic()
+    _own_changes.clear()
+    _search_index.cache_clear()
+    _conflict_index.cache_clear()
+    _years.cache_clear()
+    feeds.clear()
+    report_cache.clear()
+
+
+def sync_caches():
+    """Подтягивает в кеши изменения событий, сделанные в обход этого процесса
+
+    События меняют импорт, миграция, другие воркеры и асинхронный режим приложения.
+    Их изменения находятся по `updated_at` не чаще раза в CACHE_SYNC_INTERVAL секунд,
+    а удаления так не увидеть, поэтому раз в CACHE_TTL секунд кеши строятся заново.
+    """
+    now = time.monotonic()
+    with _sync_lock:
+        if _sync_state['reset'] is None or now - _sync_state['reset'] >= app.config['CACHE_TTL']:
+            reset_caches()
+            return
+        if now - _sync_state['checked'] < app.config['CACHE_SYNC_INTERVAL']:
+            return
+        _sync_state['checked'] = now
+
+        changed = get_storage().changed_since(_sync_state['since'])
+        if changed:
+            _sync_state['since'] = changed[-1]['updated_at']
+        keys = {(e['_id'], e['updated_at']) for e in changed}
+        external = [e for e in changed if (e['_id'], e['updated_at']) not in _own_changes]
+        _own_changes.difference_update(keys)
+        if not external:
+            return
+
+        # прежние версии событий неизвестны, поэтому ленты и отчеты сбрасываем целиком,
+        # а в индексах событие заменяется по _id; еще не построенные индексы не трогаем
+        _years.cache_clear()
+        feeds.clear()
+        report_cache.clear()
+        if _search_index.cache_info().currsize:
+            _search_index().add(external)
+        if _conflict_index.cache_info().currsize:
+            _conflict_index().add(external)
+
+
+def get_search_index():
+    sync_caches()
+    return _search_index()
 
-    for e in events:
-        events_col.insert_one(e)
+
+def get_years():
+    sync_caches()
+    return _years()
+
+
+def get_conflict_index():
+    sync_caches()
+    return _conflict_index()
+
+
+def find_conflicts(events):
+    """Пересечения событий по учителям и местам с уже сохраненными: [{'event', 'other', 'key'}, ...]"""
+
+    index = get_conflict_index()
+    return [{'event': event, 'other': conflict['event'], 'key': conflict['key']}
+            for event in events
+            for conflict in index.conflicts(event)]
+
+
+def events_changed(old_events, new_events):
+    """Обновляет то, что построено из событий, после их добавления/изменения/удаления
+
+    old_events - версии событий до изменения (изменены или удалены),
+    new_events - после (добавлены или изменены).
+    """
+    events = [*old_events, *new_events]
+    with _sync_lock:
+        # свои изменения sync_caches увидит в базе, но применять их второй раз не нужно
+        _own_changes.update((e['_id'], e['updated_at']) for e in new_events)
+    layouts.rebuild(get_storage(), layouts.event_months(events))
+    _years.cache_clear()
+    feeds.invalidate(events)
+    report_cache.invalidate(events)
+
+    index = _search_index()
+    index.remove(e['_id'] for e in old_events)
+    index.add(new_events)
+
+    conflicts = _conflict_index()
+    conflicts.remove(e['_id'] for e in old_events)
+    conflicts.add(new_events)
+
+
+def add_events(events):
+    get_storage().insert_many(events)
+    events_changed([], events)
 
 
 def get_events(year, month):
     """Получаем события из базы за последний месяц"""
-    db = get_db()
-    events_col = db['events']
-    start_of_month = datetime(year, month, 1)
-    cursor = events_col.find(
-        {'start_date': {'$gte': start_of_month,
-                        '$lt': next_month_first_day(start_of_month)}}
-    )
-    return [e for e in cursor]
+    return layouts.month_events(get_storage(), year, month)
+
+
+def get_month_events(year, month):
+    """Получаем подготовленные для календаря события месяца"""
+    return layouts.get(get_storage(), year, month)
 
 
 def get_event_by_id(event_id):
-    db = get_db()
-    events_col = db['events']
-    return events_col.find_one({'_id': ObjectId(event_id)})
+    return get_storage().find_one(event_id)
 
 
-def save_event(event_id, form):
-    db = get_db()
-    events_col = db['events']
+def make_edited_event(old_event, form_data):
+    """Подготавливает новую версию события из формы редактирования"""
 
-    events_col.replace_one(
-        {'_id': ObjectId(event_id)},
-        make_event(form.data)
-    )
+    event = make_event(form_data)
+    if 'series_id' in old_event:
+        event['series_id'] = old_event['series_id']
+    return event
 
 
-@app.template_filter()
-def teacher_names(teachers):
+def save_event(old_event, event):
+    get_storage().replace(old_event['_id'], event)
+    event['_id'] = old_event['_id']
+    events_changed([old_event], [event])
+
+
+def update_events(criteria, changes):
+    """Массово меняет поля событий, возвращает количество измененных"""
+
+    storage = get_storage()
+    events = storage.find_many(criteria)
+    changes = changes | {'updated_at': timestamp()}
+    modified = storage.update_many(criteria, changes)
+    events_changed(events, [e | changes for e in events])
+    return modified
+
+
+def delete_events(criteria):
+    """Массово удаляет события, возвращает количество удаленных"""
+
+    storage = get_storage()
+    events = storage.find_many(criteria)
+    deleted = storage.delete_many(criteria)
+    events_changed(events, [])
+    return deleted
+
+
+def bulk_update(form):
+    """Выполняет массовое изменение по заполненной форме, возвращает (ответ, статус)"""
+
+    if not form.validate():
+        return {'errors': form.errors}, 400
+    criteria = form.criteria()
+    if not criteria:
+        return {'errors': 'Не задан ни один критерий отбора'}, 400
+    changes = form.changes()
+    if not changes:
+        return {'errors': 'Не задано ни одного изменения'}, 400
+
+    if form.dry_run.data:
+        return {'matched': get_storage().count(criteria)}, 200
+    return {'modified': update_events(criteria, changes)}, 200
+
+
+def bulk_delete(form):
+    """Выполняет массовое удаление по заполненной форме, возвращает (ответ, статус)"""
+
+    if not form.validate():
+        return {'errors': form.errors}, 400
+    criteria = form.criteria()
+    if not criteria:
+        return {'errors': 'Не задан ни один критерий отбора'}, 400
+
+    if form.dry_run.data:
+        return {'matched': get_storage().count(criteria)}, 200
+    return {'deleted': delete_events(criteria)}, 200
+
+
+def get_feed(name):
+    """Возвращает (тело, etag) ленты или None, если такой ленты нет"""
+
+    if not ical.FEED_NAME_RE.fullmatch(name):
+        return None
+    sync_caches()
+    return feeds.get(name)
+
+
+def set_feed_headers(response, etag):
+    """Заголовки кеширования ленты: календари опрашивают ее каждые несколько минут"""
+
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 300
+    return response
+
+
+def get_report(name, args):
+    """Отчет за год или месяц из параметров запроса (year, month), возвращает (ответ, статус)"""
+
+    if name not in reports.REPORTS:
+        return {'errors': 'Нет такого отчета'}, 404
+    year = args.get('year', datetime.now().year, type=int)
+    month = args.get('month', type=int)
+    if month is not None and not 1 <= month <= 12:
+        return {'errors': 'Месяц должен быть от 1 до 12'}, 400
+    start, end = reports.period(year, month)
+    sync_caches()
+    return {'report': name, 'start': start.date().isoformat(), 'end': end.date().isoformat(),
+            'rows': report_cache.get(name, start, end)}, 200
+
+
+def make_month_data(year, month, events):
+    """Данные месяца для шаблона календаря"""
+    return {
+        'dates': get_month_dates(year, month),
+        'events': events,
+        'month': month,
+        'month_name': MonthName(month).name.title(),
+        'year': year
+    }
+
+
+def search_result(event):
+    """Событие в ответе поиска"""
+    return {
+        'id': str(event['_id']),
+        'name': event['name'],
+        'dates': event['dates'],
+        'start_date': event['start_date'].date().isoformat(),
+        'place': event['place'],
+        'teachers': event.get('teachers', []),
+    }
+
+
+def iter_month_data(year, event_filter=None):
+    """Данные месяцев года, каждый месяц запрашивается непосредственно перед отрисовкой"""
+    for month in range(1, 12+1):
+        events = get_month_events(year, month)
+        if event_filter:
+            events = event_filter.apply(events)
+        yield make_month_data(year, month, events)
+
+
+def make_edit_form(event):
+    """Форма редактирования, заполненная данными события"""
+
+    start_time = None
+    if event.get('time'):
+        start_time = datetime.strptime(event['time'], "%H:%M")
+    return EventForm(data=event, event_type=event['type'], start_time=start_time)
+
+
+@lru_cache(maxsize=None)
+def _teacher_names(teachers):
     names = []
     for t in teachers:
         last_name, first_name = t.split()
@@ -274,36 +584,123 @@ def teacher_names(teachers):
     return ' + '.join(names)
 
 
+@app.template_filter()
+def teacher_names(teachers):
+    # составы учителей повторяются из события в событие, поэтому запоминаем результат
+    return _teacher_names(tuple(teachers))
+
+
+class EventDetails:
+    """Подробности о событиях месяца для окна с информацией в компактной разметке
+
+    Каждое событие попадает в JSON один раз, даже если оно разбито на блоки
+    по неделям, а блок ссылается на него по номеру.
+    """
+
+    def __init__(self, events):
+        self._index = {}
+        self.items = []
+        for event in events:
+            key = self._key(event)
+            if key not in self._index:
+                self._index[key] = len(self.items)
+                self.items.append([
+                    event['name'],
+                    event['dates'],
+                    event.get('time', ''),
+                    event['place'],
+                    ', '.join(event.get('teachers', [])),
+                    event.get('num_payments') or '',
+                ])
+
+    def _key(self, event):
+        return event.get('_id') or (event['name'], event['dates'], event['place'])
+
+    def index(self, event):
+        return self._index[self._key(event)]
+
+    @property
+    def json(self):
+        # < экранируем, чтобы строка из базы не могла закрыть тег <script>
+        return Markup(codec.dumps(self.items).replace('<', '\\u003c'))
+
+
+@app.template_filter()
+def event_details(events):
+    return EventDetails(events)
+
+
 @app.route("/")
 def home_page():
     return redirect(url_for('calendar_page', year=datetime.now().year))
 
 
 @app.route("/<int:year>.html")
-def calendar_page(year):
-    years = [2025, 2026]
-    calendar_data = []
+@app.route("/<int:year>-<filter_name>.html")
+def calendar_page(year, filter_name=None):
+    if year not in get_years():
+        abort(404)
+    event_filter = None
+    if filter_name and (event_filter := FILTERS_BY_NAME.get(filter_name)) is None:
+        abort(404)
+
+    # прошедшие годы здесь тоже рисуются заново и редактируются: архив есть только у статики
     form = EventForm()
 
-    for month in range(1, 12+1):
-        calendar_data.append({
-            'dates': get_month_dates(year, month),
-            'events': prepare_events(get_events(year, month)),
-            'month': month,
-            'month_name': MonthName(month).name.title(),
-            'year': year
-        })
+    if app.config['STREAM_PAGES']:
+        # шапка и первый месяц уходят в браузер, пока следующие месяцы еще считаются
+        return stream_template(
+            'page.html',
+            calendar_data=iter_month_data(year, event_filter),
+            years=get_years(),
+            current_year=year,
+            filters=FILTERS,
+            current_filter=event_filter,
+            can_edit=True,
+            form=form
+        )
+
+    calendar_data = list(iter_month_data(year, event_filter))
 
     return render_template(
         'page.html',
         calendar_data=calendar_data,
-        years=years,
+        years=get_years(),
         current_year=year,
+        filters=FILTERS,
+        current_filter=event_filter,
         can_edit=True,
         form=form
     )
 
 
+@app.route("/feeds/<name>.ics")
+def feed(name):
+    """Лента событий в формате iCalendar для подписки в календаре"""
+
+    if (feed := get_feed(name)) is None:
+        abort(404)
+
+    body, etag = feed
+    response = set_feed_headers(Response(body, mimetype='text/calendar'), etag)
+    return response.make_conditional(request)
+
+
+@app.route("/search")
+def search():
+    """Поиск событий по названию, учителям и месту (для автодополнения)"""
+
+    results = get_search_index().search(request.args.get('q', ''))
+    return {'results': [search_result(e) for e in results]}
+
+
+@app.route("/reports/<name>")
+def report(name):
+    """Отчет за год или месяц: /reports/teachers?year=2025&month=3"""
+
+    return get_report(name, request.args)
+
+
 @app.route("/events/", methods=["POST"])
 def events():
     """Добавление события"""
@@ -311,27 +708,32 @@ def events():
     form = EventForm(request.form)
     print(form.data)
 
-    start_date = form.start_date.data
-    year = start_date.year
-    month = start_date.month
-
     if request.method == "POST" and form.validate():
+        start_date = form.start_date.data
+        year = start_date.year
+        month = start_date.month
         event_type = form.event_type.data
         schedule = form.schedule.data
 
-        if event_type in ["practices", "practices_vtp", "yoga", "yoga_joints", "yoga_spine"] and schedule:
+        if event_type in RECURRING_TYPES and schedule:
             events = list(make_recurring_events(form.data))
             for event in events:
                 print(event)
-            add_events(events)
         else:
             event = make_event(form.data)
             print(event)
-            add_events([event])
+            events = [event]
+
+        conflicts = find_conflicts(events)
+        if conflicts and not form.force.data:
+            return render_template("event-form.html", form=form, edit=False, url=url_for('events'),
+                                   conflicts=conflicts)
+        add_events(events)
 
         return redirect(url_for('calendar_page', year=year, _anchor=str(month)))
     else:
-        return str(form.errors)
+        # форма с ошибками заменяет содержимое диалога (см. admin.js)
+        return render_template("event-form.html", form=form, edit=False, url=url_for('events')), 400
 
 
 @app.route("/events/<event_id>", methods=["POST"])
@@ -343,12 +745,31 @@ def edit_event(event_id):
     start_date = event['start_date']
 
     if form.validate():
-        save_event(event_id, form)
+        new_event = make_edited_event(event, form.data)
+        conflicts = find_conflicts([new_event | {'_id': event['_id']}])
+        if conflicts and not form.force.data:
+            return render_template("event-form.html", form=form, edit=True,
+                                   url=url_for('edit_event', event_id=event_id), conflicts=conflicts)
+        save_event(event, new_event)
         print(form.data)
         return redirect(url_for('calendar_page', year=start_date.year, _anchor=str(start_date.month)))
     else:
-        # return str(form.errors)
-        return render_template("event-form.html", form=form, edit=True, url=url_for('edit_event', event_id=event_id))
+        return render_template("event-form.html", form=form, edit=True,
+                               url=url_for('edit_event', event_id=event_id)), 400
+
+
+@app.route("/events/bulk/update", methods=["POST"])
+def bulk_update_events():
+    """Массовое изменение событий (например, всей серии поддерживающих занятий)"""
+
+    return bulk_update(BulkUpdateForm(request.form))
+
+
+@app.route("/events/bulk/delete", methods=["POST"])
+def bulk_delete_events():
+    """Массовое удаление событий"""
+
+    return bulk_delete(BulkFilterForm(request.form))
 
 
 @app.route("/event/form/<event_id>")
@@ -356,13 +777,9 @@ def get_event_form(event_id):
     event = get_event_by_id(event_id)
     print(event)
 
-    start_time = None
-    if event.get('time'):
-        start_time = datetime.strptime(event['time'], "%H:%M")
-    form = EventForm(data=event, event_type=event['type'], start_time=start_time)
     return render_template(
         "event-form.html",
-        form=form,
+        form=make_edit_form(event),
         edit=True,
         url=url_for('edit_event', event_id=event_id),
     )
@@ -0,0 +1,82 @@
+"""Годы календаря и архив прошедших годов статического сайта
+
+Список годов берется из данных: от года самого раннего события до года
+самого позднего (и не меньше текущего). События прошедшего года больше не
+меняются, поэтому уже записанные в out/ страницы прошедших годов - архив:
+сборщик статики их пропускает, так что время сборки не растет с количеством
+лет. Чтобы пересобрать архивный год (например, после исправления старого
+события), его нужно разморозить:
+
+    python make_calendar.py --thaw 2024
+
+Навигация по годам и фильтрам (templates/nav.html) стоит в странице между
+метками NAV_START и NAV_END. Когда список годов меняется, сборщик и демон
+переписывают ее в архивных страницах, не трогая месяцы, поэтому архивные
+страницы всегда ссылаются на все годы. Страницы, записанные до появления меток,
+нужно один раз разморозить.
+
+Заголовками `Cache-Control: immutable` архив не отдается: out/ раздается как
+обычные статические файлы, кеширование задает веб-сервер (обычный max-age с
+проверкой по ETag/Last-Modified), а неизменяемыми страницы не назовешь - их
+навигация обновляется.
+
+Приложение (админка) архивом не пользуется: прошедшие годы в нем рисуются
+заново и редактируются как обычно.
+"""
+from datetime import datetime
+from pathlib import Path
+
+
+NAV_START = '<!-- nav -->'
+NAV_END = '<!-- /nav -->'
+
+
+def discover_years(storage, today=None):
+    """Годы, за которые есть события, включая текущий"""
+
+    today = today or datetime.now()
+    span = storage.date_range()
+    if span is None:
+        return [today.year]
+    first, last = span
+    return list(range(min(first.year, today.year), max(last.year, today.year) + 1))
+
+
+def is_past(year, today=None):
+    return year < (today or datetime.now()).year
+
+
+class Archive:
+    """Записанные страницы прошедших годов в папке path
+
+    У года есть полная страница и страницы фильтров (filter_name - имя фильтра, см. filters.py).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def page_path(self, year, filter_name=None):
+        return self.path / (f'{year}-{filter_name}.html' if filter_name else f'{year}.html')
+
+    def is_frozen(self, year, today=None, filter_name=None):
+        return is_past(year, today) and self.page_path(year, filter_name).exists()
+
+    def is_year_frozen(self, year, filter_names, today=None):
+        """Записаны ли и полная страница прошедшего года, и страницы всех его фильтров"""
+
+        return self.is_frozen(year, today) and all(self.is_frozen(year, today, name) for name in filter_names)
+
+    def replace_nav(self, year, nav, filter_name=None):
+        """Заменяет навигацию (вместе с метками) в записанной странице, возвращает True, если она изменилась"""
+
+        path = self.page_path(year, filter_name)
+        html = path.read_text()
+        start = html.find(NAV_START)
+        end = html.find(NAV_END, start)
+        if start < 0 or end < 0:
+            return False
+        updated = html[:start] + nav + html[end + len(NAV_END):]
+        if updated == html:
+            return False
+        path.write_text(updated)
+        return True
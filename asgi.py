@@ -0,0 +1,181 @@
+"""Асинхронный режим приложения (ASGI)
+
+Те же маршруты и шаблоны, что и в app.py, но на Quart и с асинхронным
+драйвером MongoDB: страница года запрашивает все месяцы параллельно, а
+обработчики форм не занимают воркер, пока ждут базу. Обновление раскладок
+и лент после записи выполняет синхронный код из app.py в потоке.
+
+    hypercorn asgi:app
+"""
+import asyncio
+from datetime import datetime
+from functools import cache
+
+from quart import Quart, Response, abort, request, redirect, url_for, render_template
+
+import app as sync_app
+from app import (FILTERS, FILTERS_BY_NAME, RECURRING_TYPES, CodecJSONProvider, EventForm, BulkFilterForm,
+                 BulkUpdateForm, make_event, make_recurring_events, make_edited_event, make_month_data, make_edit_form,
+                 search_result)
+import layouts
+from storage import open_async_storage
+
+
+app = Quart(__name__)
+app.json = CodecJSONProvider(app)
+app.add_template_filter(sync_app.teacher_names)
+app.add_template_filter(sync_app.event_details)
+
+
+@cache
+def get_storage():
+    # клиент создается при первом запросе, уже внутри цикла событий сервера
+    return open_async_storage()
+
+
+async def events_changed(old_events, new_events):
+    await asyncio.to_thread(sync_app.events_changed, old_events, new_events)
+
+
+async def get_month_data(year, month):
+    return make_month_data(year, month, await layouts.get_async(get_storage(), year, month))
+
+
+@app.route("/")
+async def home_page():
+    return redirect(url_for('calendar_page', year=datetime.now().year))
+
+
+@app.route("/<int:year>.html")
+@app.route("/<int:year>-<filter_name>.html")
+async def calendar_page(year, filter_name=None):
+    years = await asyncio.to_thread(sync_app.get_years)
+    if year not in years:
+        abort(404)
+    event_filter = None
+    if filter_name and (event_filter := FILTERS_BY_NAME.get(filter_name)) is None:
+        abort(404)
+
+    calendar_data = await asyncio.gather(*(get_month_data(year, month) for month in range(1, 12+1)))
+    if event_filter:
+        calendar_data = [month | {'events': event_filter.apply(month['events'])} for month in calendar_data]
+
+    return await render_template(
+        'page.html',
+        calendar_data=calendar_data,
+        years=years,
+        current_year=year,
+        filters=FILTERS,
+        current_filter=event_filter,
+        can_edit=True,
+        form=EventForm()
+    )
+
+
+@app.route("/feeds/<name>.ics")
+async def feed(name):
+    """Лента событий в формате iCalendar для подписки в календаре"""
+
+    # лента почти всегда в кеше, в базу (синхронно, в потоке) идем только после изменений
+    if (feed := await asyncio.to_thread(sync_app.get_feed, name)) is None:
+        abort(404)
+
+    body, etag = feed
+    response = sync_app.set_feed_headers(Response(body, mimetype='text/calendar'), etag)
+    await response.make_conditional(request)
+    return response
+
+
+@app.route("/search")
+async def search():
+    """Поиск событий по названию, учителям и месту (для автодополнения)"""
+
+    index = await asyncio.to_thread(sync_app.get_search_index)
+    results = index.search(request.args.get('q', ''))
+    return {'results': [search_result(e) for e in results]}
+
+
+@app.route("/reports/<name>")
+async def report(name):
+    """Отчет за год или месяц: /reports/teachers?year=2025&month=3"""
+
+    return await asyncio.to_thread(sync_app.get_report, name, request.args)
+
+
+@app.route("/events/", methods=["POST"])
+async def events():
+    """Добавление события"""
+
+    form = EventForm(await request.form)
+
+    if form.validate():
+        start_date = form.start_date.data
+        year = start_date.year
+        month = start_date.month
+        if form.event_type.data in RECURRING_TYPES and form.schedule.data:
+            events = list(make_recurring_events(form.data))
+        else:
+            events = [make_event(form.data)]
+
+        conflicts = await asyncio.to_thread(sync_app.find_conflicts, events)
+        if conflicts and not form.force.data:
+            return await render_template("event-form.html", form=form, edit=False, url=url_for('events'),
+                                         conflicts=conflicts)
+        await get_storage().insert_many(events)
+        await events_changed([], events)
+
+        return redirect(url_for('calendar_page', year=year, _anchor=str(month)))
+    else:
+        return await render_template("event-form.html", form=form, edit=False, url=url_for('events')), 400
+
+
+@app.route("/events/<event_id>", methods=["POST"])
+async def edit_event(event_id):
+    """Редактирования события"""
+
+    storage = get_storage()
+    old_event = await storage.find_one(event_id)
+    form = EventForm(await request.form, data=old_event)
+    start_date = old_event['start_date']
+
+    if form.validate():
+        event = make_edited_event(old_event, form.data)
+        conflicts = await asyncio.to_thread(sync_app.find_conflicts, [event | {'_id': old_event['_id']}])
+        if conflicts and not form.force.data:
+            return await render_template("event-form.html", form=form, edit=True,
+                                         url=url_for('edit_event', event_id=event_id), conflicts=conflicts)
+        await storage.replace(event_id, event)
+        event['_id'] = old_event['_id']
+        await events_changed([old_event], [event])
+        return redirect(url_for('calendar_page', year=start_date.year, _anchor=str(start_date.month)))
+    else:
+        return await render_template("event-form.html", form=form, edit=True,
+                                     url=url_for('edit_event', event_id=event_id)), 400
+
+
+@app.route("/events/bulk/update", methods=["POST"])
+async def bulk_update_events():
+    """Массовое изменение событий"""
+
+    form = BulkUpdateForm(await request.form)
+    return await asyncio.to_thread(sync_app.bulk_update, form)
+
+
+@app.route("/events/bulk/delete", methods=["POST"])
+async def bulk_delete_events():
+    """Массовое удаление событий"""
+
+    form = BulkFilterForm(await request.form)
+    return await asyncio.to_thread(sync_app.bulk_delete, form)
+
+
+@app.route("/event/form/<event_id>")
+async def get_event_form(event_id):
+    event = await get_storage().find_one(event_id)
+
+    return await render_template(
+        "event-form.html",
+        form=make_edit_form(event),
+        edit=True,
+        url=url_for('edit_event', event_id=event_id),
+    )
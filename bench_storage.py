@@ -0,0 +1,75 @@
+"""Сравнение скорости хранилищ на синтетических событиях
+
+    python bench_storage.py sqlite:////tmp/bench.db mongodb://127.0.0.1:27017/aol_bench
+
+Хранилища должны быть пустыми: бенчмарк записывает в них события.
+"""
+import argparse
+from datetime import datetime, timedelta
+import random
+import time
+
+from cal_utils import next_month_first_day
+from storage import open_storage
+
+
+def make_events(years, per_month=40):
+    """Генерирует события, похожие на настоящие"""
+
+    rnd = random.Random(0)
+    places = ['Театральная, 17', 'Театральная, 17 (малый зал)', 'Онлайн, время МСК+5', 'Луговое (ул. Изумрудная, 8)']
+    teachers = ['Артиш Анжелика', 'Кузьминич Алексей', 'Шумакова Ольга', 'Маслов Андрей', 'Яскевич Мира']
+    for year in years:
+        for month in range(1, 12+1):
+            for _ in range(per_month):
+                start = datetime(year, month, rnd.randint(1, 28))
+                yield {
+                    'name': 'Счастье',
+                    'type': 'happiness',
+                    'dates': '',
+                    'place': rnd.choice(places),
+                    'teachers': rnd.sample(teachers, 2),
+                    'start_date': start,
+                    'end_date': start + timedelta(days=rnd.choice([0, 0, 0, 2, 3])),
+                }
+
+
+def timeit(func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(storage, years):
+    events = list(make_events(years))
+    months = [datetime(year, month, 1) for year in years for month in range(1, 12+1)]
+
+    def read_months():
+        for m in months:
+            storage.find_range(m, next_month_first_day(m))
+
+    return {
+        'insert_many': timeit(lambda: storage.insert_many(events)),
+        'find_range (все месяцы)': timeit(read_months, repeat=10),
+        'distinct teachers': timeit(lambda: storage.distinct('teachers'), repeat=10),
+        'distinct place': timeit(lambda: storage.distinct('place'), repeat=10),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Сравнение скорости хранилищ')
+    parser.add_argument('urls', nargs='+', help='URL пустых хранилищ')
+    parser.add_argument('--years', type=int, default=5, help='сколько лет событий сгенерировать')
+    args = parser.parse_args()
+
+    years = list(range(2020, 2020 + args.years))
+
+    for url in args.urls:
+        storage = open_storage(url)
+        if storage.count():
+            parser.exit(1, f'В хранилище {url} уже есть события\n')
+
+        print(url)
+        for name, seconds in bench(storage, years).items():
+            print(f'  {name:<25} {seconds * 1000:8.2f} мс')
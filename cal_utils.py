@@ -2,6 +2,7 @@
 import calendar
 from datetime import datetime, date, timedelta
 from itertools import groupby
+import re
 
 
 def next_month_first_day(d):
@@ -161,13 +162,34 @@ def assign_levels(events):
     return events
 
 
-def prepare_events(events):
-    """Подготавливает события для отображения в календаре"""
+def level_blocks(blocks):
+    """Распределяет по уровням блоки событий каждой недели (меняет pos блоков)"""
 
-    blocks = (e for e in make_cal_blocks(events))
     blocks = sorted(blocks, key=lambda e: (e['pos']['week'], e['pos']['start']))
     indexed = []
     for _, group in groupby(blocks, lambda e: e['pos']['week']):
         indexed.extend(assign_levels(group))
 
     return indexed
+
+
+def prepare_events(events):
+    """Подготавливает события для отображения в календаре"""
+    return level_blocks(make_cal_blocks(events))
+
+
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+def slugify(text):
+    """Превращает название (места, учителя) в латинский идентификатор для URL и имен файлов
+
+    >>> slugify('Театральная, 17 (малый зал)')
+    'teatralnaya-17-malyy-zal'
+    """
+    return re.sub(r'[^a-z0-9]+', '-', text.lower().translate(TRANSLIT)).strip('-')
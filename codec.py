@@ -0,0 +1,90 @@
+"""JSON для файлов данных, хранилища и ответов API
+
+Если установлен orjson, кодирование и разбор идут через него, иначе через
+стандартный json - результат одинаковый. Даты, дата-время и ObjectId
+сохраняются в виде расширенного JSON MongoDB и читаются обратно теми же
+типами:
+
+    {'$date': '2025-10-17T00:00:00'}, {'$date': '2025-10-17'}, {'$oid': '...'}
+
+По умолчанию JSON компактный (без отступов и пробелов), с отступами пишутся
+только файлы, которые правят руками.
+"""
+from datetime import date, datetime
+import json
+from pathlib import Path
+
+from bson.objectid import ObjectId
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, (datetime, date)):
+        return {'$date': obj.isoformat()}
+    if isinstance(obj, ObjectId):
+        return {'$oid': str(obj)}
+    raise TypeError(f'Не могу сериализовать {type(obj).__name__}')
+
+
+def _object_hook(obj):
+    if len(obj) == 1:
+        if '$date' in obj:
+            value = obj['$date']
+            # дата без времени - 'YYYY-MM-DD'
+            return date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+        if '$oid' in obj:
+            return ObjectId(obj['$oid'])
+    return obj
+
+
+def _decode(obj):
+    """Восстанавливает даты и ObjectId в результате orjson (у него нет object_hook)"""
+
+    if isinstance(obj, dict):
+        return _object_hook({key: _decode(value) for key, value in obj.items()})
+    if isinstance(obj, list):
+        return [_decode(value) for value in obj]
+    return obj
+
+
+def dumpb(obj, pretty=False):
+    """Кодирует объект в JSON (UTF-8, bytes)"""
+
+    if orjson:
+        # даты тоже отдаем в _default, иначе orjson запишет их голыми строками,
+        # а нестроковые ключи, как и json, превращаем в строки
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    return dumps(obj, pretty).encode()
+
+
+def dumps(obj, pretty=False):
+    """Кодирует объект в JSON (str)"""
+
+    if orjson:
+        return dumpb(obj, pretty).decode()
+    if pretty:
+        return json.dumps(obj, default=_default, ensure_ascii=False, indent=2)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(data):
+    """Разбирает JSON из str или bytes"""
+
+    if orjson:
+        return _decode(orjson.loads(data))
+    return json.loads(data, object_hook=_object_hook)
+
+
+def dump(obj, path, pretty=False):
+    Path(path).write_bytes(dumpb(obj, pretty))
+
+
+def load(path):
+    return loads(Path(path).read_bytes())
@@ -0,0 +1,192 @@
+"""Пересечения событий у учителей и мест
+
+Для каждого учителя и каждого места хранится индекс интервалов занятости,
+отсортированных по началу. Событие длится не больше нескольких дней, поэтому
+пересекающиеся интервалы находятся двоичным поиском в окне
+[начало - самый длинный интервал, конец) без просмотра всех событий.
+
+    python conflicts.py audit 2026
+    python conflicts.py free "Театральная, 17" 3 --from 2026-11-01 --to 2026-12-31
+"""
+import argparse
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+import threading
+
+from storage import open_storage
+
+
+# в этих местах события друг другу не мешают
+SHARED_PLACES = {'Онлайн, время МСК+5', 'Место уточняется'}
+
+# время окончания не хранится, поэтому считаем, что занятие со временем начала длится столько
+TIMED_EVENT_DURATION = timedelta(hours=2)
+
+
+def event_interval(event):
+    """Интервал занятости [начало, конец) события
+
+    Однодневное событие со временем начала занимает TIMED_EVENT_DURATION,
+    остальные - дни с первого по последний целиком.
+    """
+    start = event['start_date']
+    end = event['end_date']
+    if event.get('time') and start == end:
+        hour, minute = map(int, event['time'].split(':'))
+        start = start + timedelta(hours=hour, minutes=minute)
+        return start, start + TIMED_EVENT_DURATION
+    return start, end + timedelta(days=1)
+
+
+def event_keys(event):
+    """Ресурсы, которые занимает событие: ('teacher', имя) и ('place', место)"""
+
+    keys = [('teacher', t) for t in event.get('teachers', [])]
+    if event['place'] not in SHARED_PLACES:
+        keys.append(('place', event['place']))
+    return keys
+
+
+class IntervalIndex:
+    """Интервалы [start, end), отсортированные по началу"""
+
+    def __init__(self):
+        self._items = []  # [(start, end, id), ...]
+        self._max_length = timedelta(0)
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, start, end, item_id):
+        insort(self._items, (start, end, item_id))
+        self._max_length = max(self._max_length, end - start)
+
+    def remove(self, start, end, item_id):
+        i = bisect_left(self._items, (start, end, item_id))
+        if i < len(self._items) and self._items[i] == (start, end, item_id):
+            del self._items[i]
+
+    def overlapping(self, start, end):
+        """Интервалы, пересекающиеся с [start, end)"""
+
+        # интервал, начавшийся раньше start - max_length, закончился до start
+        lo = bisect_left(self._items, (start - self._max_length,))
+        hi = bisect_left(self._items, (end,))
+        return [item for item in self._items[lo:hi] if item[1] > start]
+
+
+class ConflictIndex:
+    def __init__(self):
+        self._indexes = defaultdict(IntervalIndex)
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def add(self, events):
+        with self._lock:
+            for event in events:
+                self._remove(event['_id'])
+                self._events[event['_id']] = event
+                start, end = event_interval(event)
+                for key in event_keys(event):
+                    self._indexes[key].add(start, end, event['_id'])
+
+    def remove(self, event_ids):
+        with self._lock:
+            for event_id in event_ids:
+                self._remove(event_id)
+
+    def _remove(self, event_id):
+        event = self._events.pop(event_id, None)
+        if event is None:
+            return
+        start, end = event_interval(event)
+        for key in event_keys(event):
+            self._indexes[key].remove(start, end, event_id)
+
+    def conflicts(self, event):
+        """Возвращает пересечения события с другими: [{'kind', 'key', 'event'}, ...]"""
+
+        start, end = event_interval(event)
+        found = []
+        with self._lock:
+            for kind, key in event_keys(event):
+                if (kind, key) not in self._indexes:
+                    continue
+                for _, _, other_id in self._indexes[(kind, key)].overlapping(start, end):
+                    if other_id != event.get('_id'):
+                        found.append({'kind': kind, 'key': key, 'event': self._events[other_id]})
+        return found
+
+    def free_slots(self, place, days, start, end):
+        """Промежутки не короче days дней в [start, end], когда место свободно
+
+        Возвращает [(первый свободный день, последний свободный день), ...].
+        """
+        busy = set()
+        with self._lock:
+            index = self._indexes.get(('place', place))
+            begin = datetime.combine(start, datetime.min.time())
+            finish = datetime.combine(end, datetime.min.time()) + timedelta(days=1)
+            for busy_start, busy_end, _ in (index.overlapping(begin, finish) if index else []):
+                day = busy_start.date()
+                while datetime.combine(day, datetime.min.time()) < busy_end:
+                    busy.add(day)
+                    day += timedelta(days=1)
+
+        slots = []
+        slot_start = None
+        day = start
+        while day <= end + timedelta(days=1):
+            if day <= end and day not in busy:
+                slot_start = slot_start or day
+            elif slot_start:
+                if (day - slot_start).days >= days:
+                    slots.append((slot_start, day - timedelta(days=1)))
+                slot_start = None
+            day += timedelta(days=1)
+        return slots
+
+
+def audit(events):
+    """Возвращает все пары пересекающихся событий: [(событие, событие, [(kind, key), ...]), ...]"""
+
+    index = ConflictIndex()
+    index.add(events)
+    pairs = {}
+    for event in events:
+        for conflict in index.conflicts(event):
+            other = conflict['event']
+            if event['_id'] < other['_id']:
+                pair = pairs.setdefault((event['_id'], other['_id']), (event, other, []))
+                pair[2].append((conflict['kind'], conflict['key']))
+    return sorted(pairs.values(), key=lambda p: p[0]['start_date'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пересечения событий у учителей и мест')
+    commands = parser.add_subparsers(dest='command', required=True)
+    audit_parser = commands.add_parser('audit', help='все пересечения за год')
+    audit_parser.add_argument('year', type=int)
+    free_parser = commands.add_parser('free', help='свободные промежутки места')
+    free_parser.add_argument('place')
+    free_parser.add_argument('days', type=int, help='сколько дней подряд нужно')
+    free_parser.add_argument('--from', dest='start', type=date.fromisoformat, default=date.today())
+    free_parser.add_argument('--to', dest='end', type=date.fromisoformat)
+    args = parser.parse_args()
+
+    storage = open_storage()
+
+    if args.command == 'audit':
+        events = storage.find_range(datetime(args.year, 1, 1), datetime(args.year + 1, 1, 1))
+        for event, other, keys in audit(events):
+            reasons = ', '.join(key for _, key in keys)
+            print(f"{event['start_date']:%d.%m.%Y} {event['name']} / {other['start_date']:%d.%m.%Y} {other['name']}: {reasons}")
+    else:
+        end = args.end or args.start + timedelta(days=90)
+        index = ConflictIndex()
+        # захватываем события, начавшиеся раньше, но еще идущие в начале периода
+        index.add(storage.find_range(datetime.combine(args.start, datetime.min.time()) - timedelta(days=31),
+                                     datetime.combine(end, datetime.min.time()) + timedelta(days=1)))
+        for first, last in index.free_slots(args.place, args.days, args.start, end):
+            print(f'{first:%d.%m.%Y} - {last:%d.%m.%Y}')
@@ -1,22 +1,18 @@
+from collections import Counter
 from datetime import datetime
-import json
 from pathlib import Path
 from pprint import pprint
 import re
 
-from pymongo import MongoClient
-
+import codec
+import layouts
 from parsing_utils import parse_dates, get_course_type
+from storage import open_storage, timestamp
 
 
 data_file_name_re = re.compile(r'\d{4}_\d{1,2}.json')
 
 
-def get_db(url='mongodb://127.0.0.1:27017/', dbname='aol_calendar'):
-    client = MongoClient(url)
-    return client[dbname]
-
-
 def year_month(data_file):
     """Возвращает пару (год, месяц)"""
     return tuple(map(int, data_file.stem.split('_')))
@@ -32,8 +28,7 @@ def get_data_files(data_dir):
 
 
 def get_json_data(data_file):
-    with data_file.open() as f:
-        return json.load(f)
+    return codec.load(data_file)
 
 
 def get_month_data(data_file):
@@ -137,8 +132,7 @@ def get_all_teachers(events):
 
 
 if __name__ == '__main__':
-    db = get_db()
-    events_col = db['events']
+    storage = open_storage()
     data_dir = Path('data')
 
     events = get_all_events(data_dir)
@@ -168,7 +162,8 @@ if __name__ == '__main__':
     # location_name_id = {l['name']: l['_id'] for l in locations_col.find()}
     # teacher_name_id = {f"{t['first_name']} {t['last_name']}": t['_id'] for t in teachers_col.find()}
 
-    counter = 0
+    new_events = []
+    unknown_names = Counter()
     for e in events:
         dates = parse_dates(e['date'], e['year'])
 
@@ -178,9 +173,10 @@ if __name__ == '__main__':
             'name': e['name'],
             'dates': e['date'].lower(),
             'place': e['place'],
-            'type': get_course_type(e['name']),  # TODO проверить, что курс опознан
+            'type': get_course_type(e['name']),
             'start_date': datetime.combine(dates[0], datetime.min.time()),
             'end_date': datetime.combine(dates[-1], datetime.min.time()),
+            'updated_at': timestamp(),
         }
 
         if e.get('teachers'):
@@ -201,8 +197,18 @@ if __name__ == '__main__':
             event['admin_link'] = e['link']
             event['admin_id'] = e['id']
 
-        events_col.insert_one(event)
-        counter += 1
+        if event['type'] == 'unknown':
+            unknown_names[e['name']] += 1
+
+        new_events.append(event)
         # pprint(event, sort_dicts=False)
 
-    print(f'Скопировано {counter} событий')
+    storage.insert_many(new_events)
+    layouts.rebuild(storage, layouts.event_months(new_events))
+    print(f'Скопировано {len(new_events)} событий')
+
+    # неопознанные названия - сразу все, чтобы дополнить COURSE_NAME_TYPE за один раз
+    if unknown_names:
+        print(f'Не опознан тип у {unknown_names.total()} событий:')
+        for name, count in unknown_names.most_common():
+            print(f'  {name!r}: {count}')
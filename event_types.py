@@ -0,0 +1,31 @@
+"""Типы мероприятий
+
+Отдельно от app.py, чтобы разбор данных админки (parsing_utils) мог знать
+типы, не поднимая веб-приложение и подключение к базе.
+"""
+import enum
+
+
+class EventType(enum.StrEnum):
+    first_step = "Первый шаг"
+    happiness = "Счастье"
+    art_of_meditation = "Искусство медитации"
+    cooking = "Здоровое питание"
+    art_of_silence = "Искусство тишины"
+    dsn = "DSN"
+    practices = "Поддерживающее занятие"
+    practices_vtp = "Поддерживающее занятие для VTP"
+    yoga = "Йога"
+    yoga_spine = "Йога для позвоночника"
+    yoga_joints = "Суставная йога"
+    satsang = "Песенный сатсанг"
+    premium = "Искусство жизни — Премиум"
+
+    @classmethod
+    def choices(cls, sort=True, empty_option="Не выбрано"):
+        event_types = [(et.name, et.value) for et in cls]
+        if sort:
+            event_types = sorted(event_types, key=lambda et: et[1])
+        if empty_option:
+            event_types.insert(0, ("", empty_option))
+        return event_types
@@ -0,0 +1,61 @@
+"""Отфильтрованные страницы годов: по месту и по группе мероприятий
+
+Страница фильтра строится из той же раскладки месяца, что и полная страница:
+события месяца запрашиваются и разбиваются на блоки один раз, а для каждого
+фильтра из готовых блоков отбираются подходящие и заново распределяются по
+уровням (без пустых строк на месте отфильтрованных событий).
+
+Имена фильтров используются в именах страниц: 2026-place-onlayn-vremya-msk-5.html,
+2026-group-yoga.html.
+"""
+from cal_utils import level_blocks, slugify
+from event_types import EventType
+
+
+# группа -> (заголовок, типы); в группу без типов попадает все, что не попало в другие
+TYPE_GROUPS = {
+    'courses': ('Курсы', None),
+    'practices': ('Поддерживающие занятия', {EventType.practices.name, EventType.practices_vtp.name}),
+    'yoga': ('Йога', {EventType.yoga.name, EventType.yoga_spine.name, EventType.yoga_joints.name}),
+    'satsang': ('Сатсанги', {EventType.satsang.name}),
+}
+
+
+class EventFilter:
+    def __init__(self, name, title, predicate):
+        self.name = name
+        self.title = title
+        self.predicate = predicate
+
+    def __repr__(self):
+        return f'EventFilter({self.name!r})'
+
+    def apply(self, blocks):
+        """Отбирает блоки раскладки месяца и заново распределяет их по уровням"""
+
+        # assign_levels меняет pos, а исходные блоки нужны остальным фильтрам
+        return level_blocks(block | {'pos': dict(block['pos'])} for block in blocks if self.predicate(block))
+
+
+def _place_filter(place):
+    return EventFilter(f'place-{slugify(place)}', place, lambda e: e['place'] == place)
+
+
+def _group_filter(group, title, types):
+    if types is None:
+        grouped = set().union(*(t for _, t in TYPE_GROUPS.values() if t))
+        return EventFilter(f'group-{group}', title, lambda e: e['type'] not in grouped)
+    return EventFilter(f'group-{group}', title, lambda e: e['type'] in types)
+
+
+def make_filters(places):
+    """Фильтры по группам мероприятий и по местам"""
+
+    return ([_group_filter(group, title, types) for group, (title, types) in TYPE_GROUPS.items()]
+            + [_place_filter(place) for place in places])
+
+
+def split_year(calendar_data, filters):
+    """Данные месяцев года для каждого фильтра: {фильтр: [данные месяца, ...]}"""
+
+    return {f: [month | {'events': f.apply(month['events'])} for month in calendar_data] for f in filters}
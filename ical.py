@@ -0,0 +1,208 @@
+"""Календари в формате iCalendar (.ics) для подписки в телефоне
+
+Лента - все события или события одного типа, места или учителя. Имя ленты
+совпадает с именем файла без расширения:
+
+    all, type-yoga, place-teatralnaya-17, teacher-artish-anzhelika
+
+Текст VEVENT каждого события кешируется, а лента целиком - до первого
+изменения попадающих в нее событий, так что клиенты, опрашивающие календарь
+каждые несколько минут, не ходят в базу.
+"""
+from datetime import datetime, timedelta, timezone
+import hashlib
+import re
+import threading
+
+from cal_utils import slugify
+
+
+PRODID = '-//Art of Living Irkutsk//Calendar//RU'
+TZID = 'Asia/Irkutsk'
+UID_DOMAIN = 'aol-irkutsk'
+# сколько лет назад начинаются ленты: старые события клиентам не нужны
+YEARS_BACK = 1
+
+FEED_NAME_RE = re.compile(r'all|(type|place|teacher)-[a-z0-9_-]+')
+
+VTIMEZONE = [
+    'BEGIN:VTIMEZONE',
+    f'TZID:{TZID}',
+    'BEGIN:STANDARD',
+    'DTSTART:19700101T000000',
+    'TZOFFSETFROM:+0800',
+    'TZOFFSETTO:+0800',
+    'TZNAME:+08',
+    'END:STANDARD',
+    'END:VTIMEZONE',
+]
+
+
+def feed_start(today=None):
+    """Дата, с которой начинаются события в лентах"""
+    today = today or datetime.now()
+    return datetime(today.year - YEARS_BACK, 1, 1)
+
+
+def feed_names(event):
+    """Имена лент, в которые попадает событие"""
+
+    names = {'all', f"type-{event['type']}", f"place-{slugify(event['place'])}"}
+    names.update(f'teacher-{slugify(t)}' for t in event.get('teachers', []))
+    return names
+
+
+def _all_names(events):
+    return set().union({'all'}, *(feed_names(e) for e in events))
+
+
+def escape(text):
+    return (str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Разбивает строку длиннее 75 байт на строки-продолжения (RFC 5545, 3.1)"""
+
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while data:
+        chunk = data[:limit]
+        # не режем многобайтовый символ UTF-8 посередине
+        while len(chunk) < len(data) and (data[len(chunk)] & 0xC0) == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode())
+        data = data[len(chunk):]
+        limit = 74  # строка-продолжение начинается с пробела
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def render_event(event):
+    """Возвращает VEVENT события"""
+
+    start = event['start_date'].date()
+    end = event['end_date'].date()
+    stamp = event.get('updated_at') or event['start_date']
+    teachers = ', '.join(event.get('teachers', []))
+
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{event['_id']}@{UID_DOMAIN}",
+        f"DTSTAMP:{stamp.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}",
+        f"SUMMARY:{escape(event['name'])}",
+        f"LOCATION:{escape(event['place'])}",
+    ]
+    if event.get('time') and start == end:
+        hour, minute = map(int, event['time'].split(':'))
+        lines.append(f"DTSTART;TZID={TZID}:{start:%Y%m%d}T{hour:02}{minute:02}00")
+    else:
+        lines.append(f'DTSTART;VALUE=DATE:{start:%Y%m%d}')
+        lines.append(f'DTEND;VALUE=DATE:{end + timedelta(days=1):%Y%m%d}')
+    description = [teachers]
+    if event.get('time') and start != end:
+        description.append(f"Начало в {event['time']}")
+    if description := '\n'.join(d for d in description if d):
+        lines.append(f'DESCRIPTION:{escape(description)}')
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
+
+
+def render_feed(vevents, name):
+    """Генерирует ленту из готовых VEVENT по частям, чтобы ее можно было писать потоком"""
+
+    yield ''.join(fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}',
+        f'X-WR-TIMEZONE:{TZID}',
+        *VTIMEZONE,
+    ])
+    yield from vevents
+    yield 'END:VCALENDAR\r\n'
+
+
+class FeedCache:
+    """Кеш лент с точечной инвалидацией при изменении событий"""
+
+    def __init__(self, load_events, title='Искусство Жизни, Иркутск'):
+        self.load_events = load_events
+        self.title = title
+        self._events = {}  # (_id, updated_at) -> VEVENT
+        self._feeds = {}  # имя ленты -> (тело, etag)
+        self._names = None  # имена непустых лент, собираются за один проход по событиям
+        self._lock = threading.Lock()
+
+    def _render_event(self, event):
+        key = (event['_id'], event.get('updated_at'))
+        if key not in self._events:
+            self._events[key] = render_event(event)
+        return self._events[key]
+
+    def get(self, name):
+        """Возвращает (тело, etag) ленты или None, если в ленте нет ни одного события"""
+
+        with self._lock:
+            if name not in self._feeds:
+                events = None
+                if self._names is None:
+                    events = self.load_events()
+                    self._names = _all_names(events)
+                # за несуществующими лентами в базу не ходим и в кеше их не храним
+                if name not in self._names:
+                    return None
+                self._feeds[name] = self._build(self.load_events() if events is None else events, {name})[name]
+            return self._feeds[name]
+
+    def build_all(self):
+        """Собирает все непустые ленты за один проход по событиям"""
+
+        events = self.load_events()
+        names = _all_names(events)
+        with self._lock:
+            self._names = names
+            self._feeds = self._build(events, names)
+            return dict(self._feeds)
+
+    def _build(self, events, names):
+        # load_events отдает все события лент, так что текст VEVENT прежних версий
+        # и удаленных событий можно выбросить (иначе после clear() он копится)
+        current = {(e['_id'], e.get('updated_at')) for e in events}
+        self._events = {key: vevent for key, vevent in self._events.items() if key in current}
+
+        selected = {name: [] for name in names}
+        for event in events:
+            for name in feed_names(event) & names:
+                selected[name].append(self._render_event(event))
+
+        feeds = {}
+        for name, vevents in selected.items():
+            if not vevents and name != 'all':
+                continue
+            body = ''.join(render_feed(vevents, self.title)).encode()
+            feeds[name] = (body, hashlib.sha1(body).hexdigest())
+        return feeds
+
+    def clear(self):
+        """Сбрасывает все ленты (текст VEVENT привязан к версии события и остается до следующей сборки)"""
+
+        with self._lock:
+            self._feeds = {}
+            self._names = None
+
+    def invalidate(self, events):
+        """Сбрасывает ленты, в которые попадают события (нужны старые и новые версии)"""
+
+        names = set().union(*(feed_names(e) for e in events))
+        with self._lock:
+            for name in names:
+                self._feeds.pop(name, None)
+            # события могли появиться в новой ленте или уйти из последней
+            self._names = None
+            ids = {e.get('_id') for e in events}
+            self._events = {key: vevent for key, vevent in self._events.items() if key[0] not in ids}
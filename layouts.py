@@ -0,0 +1,61 @@
+"""Материализованные раскладки месяцев
+
+Раскладка месяца - результат `prepare_events` для событий месяца (блоки по
+неделям с уровнями). Она меняется только при изменении событий этого месяца,
+поэтому хранится рядом с событиями и пересобирается при записи, а чтение
+месяца сводится к получению одного документа.
+
+    python layouts.py 2025 2026   # пересобрать раскладки за годы
+"""
+import argparse
+from datetime import datetime
+
+from cal_utils import next_month_first_day, prepare_events
+from storage import open_storage
+
+
+def month_events(storage, year, month):
+    """Возвращает события, начинающиеся в месяце"""
+    start_of_month = datetime(year, month, 1)
+    return storage.find_range(start_of_month, next_month_first_day(start_of_month))
+
+
+def event_months(events):
+    """Возвращает месяцы (год, месяц), в которых начинаются события"""
+    return {(e['start_date'].year, e['start_date'].month) for e in events}
+
+
+def rebuild(storage, months):
+    """Пересобирает раскладки месяцев"""
+    for year, month in sorted(months):
+        storage.save_layout(year, month, prepare_events(month_events(storage, year, month)))
+
+
+def get(storage, year, month):
+    """Возвращает раскладку месяца, собирая ее, если ее еще нет"""
+
+    blocks = storage.get_layout(year, month)
+    if blocks is None:
+        blocks = prepare_events(month_events(storage, year, month))
+        storage.save_layout(year, month, blocks)
+    return blocks
+
+
+async def get_async(storage, year, month):
+    """То же, что get, для асинхронного хранилища (см. storage.open_async_storage)"""
+
+    blocks = await storage.get_layout(year, month)
+    if blocks is None:
+        start_of_month = datetime(year, month, 1)
+        events = await storage.find_range(start_of_month, next_month_first_day(start_of_month))
+        blocks = prepare_events(events)
+        await storage.save_layout(year, month, blocks)
+    return blocks
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пересборка раскладок месяцев')
+    parser.add_argument('years', nargs='+', type=int)
+    args = parser.parse_args()
+
+    rebuild(open_storage(), [(year, month) for year in args.years for month in range(1, 12+1)])
@@ -1,19 +1,32 @@
+import argparse
 from datetime import date
-import json
 import logging
 from pathlib import Path
 
-from aa.proxy.admin import log_in, find_courses
 import dotenv
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 
-from app import get_events, teacher_names
+from archive import Archive, discover_years
+from app import FILTERS, event_details, get_month_events, get_storage, teacher_names
+import codec
+import filters
 from cal_utils import prepare_events, get_month_dates
+import ical
 from parsing_utils import get_course_type, parse_dates
+from snapshot import Snapshot, snapshot_path, snapshot_years
 
 
 logger = logging.getLogger(__name__)
 
+TEMPLATE_FILE = 'page.html'
+NAV_TEMPLATE_FILE = 'nav.html'
+OUTPUT_DIR = 'out/'
+
+MONTH_NAMES = ['январь', 'февраль', 'март',
+               'апрель', 'май', 'июнь',
+               'июль', 'август', 'сентябрь',
+               'октябрь', 'ноябрь', 'декабрь']
+
 
 def render_calendar(context, template_file):
     env = Environment(
@@ -21,6 +34,7 @@ def render_calendar(context, template_file):
         autoescape=select_autoescape()
     )
     env.filters['teacher_names'] = teacher_names
+    env.filters['event_details'] = event_details
     template = env.get_template(template_file)
     return template.render(context)
 
@@ -32,6 +46,78 @@ def write_to_file(output, output_file):
     logger.info('Записано %d байт в файл %s', len(output), output_file)
 
 
+def get_month_data(year, month, snapshot=None):
+    """Возвращает данные месяца для шаблона календаря
+
+    Если передан снимок года, события берутся из него, а не из базы.
+    """
+    # пустой снимок (год без событий) тоже снимок, в базу за ним не ходим
+    if snapshot is not None:
+        events = prepare_events(snapshot.month_events(month))
+    else:
+        events = get_month_events(year, month)
+    return {
+        'dates': get_month_dates(year, month),
+        'events': events,
+        'month': month,
+        'month_name': MONTH_NAMES[month - 1].title(),
+        'year': year
+    }
+
+
+def write_year(year, calendar_data, years, output_dir=OUTPUT_DIR, event_filter=None):
+    """Рендерит страницу года (или страницу фильтра) и записывает ее в output_dir"""
+    output = render_calendar(
+        {'calendar_data': calendar_data,
+         'years': years,
+         'current_year': year,
+         'filters': FILTERS,
+         'current_filter': event_filter,
+         'compact': True},
+        TEMPLATE_FILE
+    )
+    name = f'{year}-{event_filter.name}' if event_filter else f'{year}'
+    write_to_file(output, Path(output_dir) / f'{name}.html')
+
+
+def write_year_pages(year, calendar_data, years, output_dir=OUTPUT_DIR):
+    """Записывает полную страницу года и страницы всех фильтров из одних и тех же раскладок месяцев"""
+
+    write_year(year, calendar_data, years, output_dir)
+    for event_filter, filtered_data in filters.split_year(calendar_data, FILTERS).items():
+        write_year(year, filtered_data, years, output_dir, event_filter)
+
+
+def write_archived_nav(archive, year, years):
+    """Обновляет навигацию в архивных страницах года: с их записи могли появиться новые годы"""
+
+    updated = 0
+    for event_filter in [None, *FILTERS]:
+        nav = render_calendar(
+            {'years': years, 'current_year': year, 'filters': FILTERS, 'current_filter': event_filter},
+            NAV_TEMPLATE_FILE
+        )
+        updated += archive.replace_nav(year, nav, event_filter.name if event_filter else None)
+    if updated:
+        logger.info('Обновлена навигация в %d архивных страницах %d года', updated, year)
+
+
+def write_feeds(output_dir=OUTPUT_DIR, load_events=None):
+    """Записывает ленты iCalendar в output_dir/feeds"""
+
+    feeds_dir = Path(output_dir) / 'feeds'
+    feeds_dir.mkdir(parents=True, exist_ok=True)
+    feeds = ical.FeedCache(load_events or (lambda: get_storage().find_range(ical.feed_start())))
+    built = feeds.build_all()
+    for name, (body, _) in built.items():
+        (feeds_dir / f'{name}.ics').write_bytes(body)
+    # ленты, из которых ушли все события, удаляем, иначе подписчики видят их старую версию
+    for path in feeds_dir.glob('*.ics'):
+        if path.stem not in built:
+            path.unlink()
+    logger.info('Записано %d лент в %s', len(built), feeds_dir)
+
+
 class AdminCourses:
     """Курсы из админки сайта artofliving.ru"""
 
@@ -57,6 +143,9 @@ class AdminCourses:
 
     @property
     def _session(self):
+        # модуль админки нужен только для загрузки курсов, без него сборка из базы или снимков работает
+        from aa.proxy.admin import log_in
+
         if not self._sess:
             self._sess = log_in(*self.credentials)
         return self._sess
@@ -74,6 +163,8 @@ class AdminCourses:
         #   'teachers': 'Галина Дианова, Татьяна Шпикалова', 'num_payments': 9, 'status': 'Идет'}
         #  {'name': 'Поддерживающее занятие online', 'date': '19 Октября', 'place': 'Онлайн, время МСК+5',
         #   'num_payments': 9, 'status': 'Завершён'},
+        from aa.proxy.admin import find_courses
+
         return find_courses(self._session, month=date(year, month, 1))
 
     def parse(self, courses):
@@ -106,12 +197,11 @@ class AdminCourses:
         return prepare_events(parsed)
 
     def _save(self, filename, courses):
-        with filename.open('wt') as f:
-            json.dump(courses, f, indent=2, ensure_ascii=False)
+        # файлы админки пишутся компактно, с отступами - только файлы ручного ввода
+        codec.dump(courses, filename)
 
     def _load(self, filename):
-        with filename.open('rt') as f:
-            return json.load(f)
+        return codec.load(filename)
 
     def get(self, year, month):
         admin_file = self.data_dir / f'{year}_{month}.json'
@@ -141,42 +231,46 @@ def read_config():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Сборка статических страниц календаря')
+    parser.add_argument('--snapshot-dir', help='собирать из снимков годов (см. snapshot.py), а не из базы')
+    parser.add_argument('--thaw', type=int, action='append', default=[], metavar='YEAR',
+                        help='пересобрать прошедший год, уже записанный в out/ (можно несколько раз)')
+    args = parser.parse_args()
+
     logging.basicConfig(level='DEBUG')
     logging.getLogger('pymongo').setLevel('INFO')
 
-    template_file = 'page.html'
-    output_dir = 'out/'
-
     config = read_config()
-    email = config['EMAIL']
-    password = config['PASSWORD']
 
-    month_names = ['январь', 'февраль', 'март',
-                   'апрель', 'май', 'июнь',
-                   'июль', 'август', 'сентябрь',
-                   'октябрь', 'ноябрь', 'декабрь']
+    adm = AdminCourses((config.get('EMAIL'), config.get('PASSWORD')))
 
-    adm = AdminCourses((email, password))
+    snapshots = {}
+    if args.snapshot_dir:
+        years = snapshot_years(args.snapshot_dir)
+        snapshots = {year: Snapshot(snapshot_path(args.snapshot_dir, year)) for year in years}
+    else:
+        years = discover_years(get_storage())
 
-    years = [2025, 2026]
+    # страницы прошедших годов в out/ - архив, их не перерисовываем
+    archive = Archive(OUTPUT_DIR)
 
     for year in years:
+        if archive.is_year_frozen(year, [f.name for f in FILTERS]) and year not in args.thaw:
+            logger.info('%d год в архиве, пропускаем', year)
+            write_archived_nav(archive, year, years)
+            continue
+
         calendar_data = []
 
         for month in range(1, 12+1):
-            calendar_data.append({
-                'dates': get_month_dates(year, month),
-                # 'events': adm.get(year, month),
-                'events': prepare_events(get_events(year, month)),
-                'month': month,
-                'month_name': month_names[month - 1].title(),
-                'year': year
-            })
-
-        output = render_calendar(
-            {'calendar_data': calendar_data,
-             'years': years,
-             'current_year': year},
-            template_file
-        )
-        write_to_file(output, Path(output_dir) / f'{year}.html')
+            calendar_data.append(get_month_data(year, month, snapshots.get(year)))
+            # calendar_data[-1]['events'] = adm.get(year, month)
+
+        write_year_pages(year, calendar_data, years)
+
+    if args.snapshot_dir:
+        write_feeds(load_events=lambda: [
+            e for snap in snapshots.values() for e in snap.events() if e['start_date'] >= ical.feed_start()
+        ])
+    else:
+        write_feeds()
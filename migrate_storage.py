@@ -0,0 +1,33 @@
+"""Перенос событий из одного хранилища в другое
+
+    python migrate_storage.py mongodb://127.0.0.1:27017/aol_calendar sqlite:///data/calendar.db
+"""
+import argparse
+
+from storage import open_storage
+
+
+def migrate(source, target, batch_size=500):
+    """Копирует все события из source в target, сохраняя идентификаторы
+
+    Возвращает количество скопированных событий.
+    """
+    events = source.find_range()
+    for i in range(0, len(events), batch_size):
+        target.insert_many(events[i:i+batch_size])
+    return len(events)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Перенос событий между хранилищами')
+    parser.add_argument('source', help='URL исходного хранилища')
+    parser.add_argument('target', help='URL целевого хранилища')
+    args = parser.parse_args()
+
+    source = open_storage(args.source)
+    target = open_storage(args.target)
+
+    if target.count():
+        parser.exit(1, f'В хранилище {args.target} уже есть события, перенос отменен\n')
+
+    print(f'Перенесено {migrate(source, target)} событий')
@@ -6,6 +6,7 @@ const events = document.querySelectorAll('.event');
 addBtn.addEventListener("click", (e) => {
     addBox.showModal();
 })
+addBox.querySelector("form").addEventListener("submit", submitDialogForm);
 
 for (let event of events) {
     event.addEventListener("click", loadEditEventForm)
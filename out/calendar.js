@@ -8,26 +8,41 @@ const placeField = document.querySelector('[data-name="place"]');
 const teachersField = document.querySelector('[data-name="teachers"]');
 const peopleField = document.querySelector('[data-name="people"]');
 
+// в компактной разметке подробности о событиях лежат в JSON внутри календаря месяца
+const monthDetails = new Map();
+
+function eventDetails(btn) {
+    if (btn.dataset.i === undefined) {
+	return btn.dataset;
+    }
+    const calendar = btn.closest('.calendar');
+    if (!monthDetails.has(calendar)) {
+	monthDetails.set(calendar, JSON.parse(calendar.querySelector('.event-data').textContent));
+    }
+    const [name, dates, time, place, teachers, people] = monthDetails.get(calendar)[btn.dataset.i];
+    return {name, dates, time, place, teachers, people: String(people)};
+}
+
 for (let event of events) {
     event.addEventListener("click", (e) => {
-	const btn = e.target;
-	nameField.innerText = btn.dataset.name;
-	datesField.innerText = btn.dataset.dates;
-	timeField.innerText = btn.dataset.time || "";
-	placeField.innerText = btn.dataset.place;
-	teachersField.innerText = btn.dataset.teachers;
-	peopleField.innerText = btn.dataset.people;
+	const details = eventDetails(e.target);
+	nameField.innerText = details.name;
+	datesField.innerText = details.dates;
+	timeField.innerText = details.time || "";
+	placeField.innerText = details.place;
+	teachersField.innerText = details.teachers;
+	peopleField.innerText = details.people;
 
 	infoBox.querySelectorAll("tr").forEach((tr) => {
 	    tr.removeAttribute("hidden");
 	})
-	if (!btn.dataset.teachers) {
+	if (!details.teachers) {
 	    teachersField.closest("tr").setAttribute("hidden", true);
 	}
-	if (!btn.dataset.people) {
+	if (!details.people) {
 	    peopleField.closest("tr").setAttribute("hidden", true);
 	}
-	if (!btn.dataset.time) {
+	if (!details.time) {
 	    timeField.closest("tr").setAttribute("hidden", true);
 	}
 
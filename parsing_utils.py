@@ -1,6 +1,9 @@
 from datetime import date
+from functools import lru_cache
 import re
 
+from event_types import EventType
+
 
 COURSE_NAME_TYPE = {
     'art excel': 'art_excel',
@@ -38,12 +41,71 @@ COURSE_NAME_TYPE = {
 }
 
 
+COURSE_WORD_RE = re.compile(r'[\w+]+')
+COURSE_WORD_SYNONYMS = {'online': 'онлайн'}
+
+
+def normalize_course_name(name):
+    """Приводит название курса к виду для сопоставления: слова в нижнем регистре через пробел
+
+    >>> normalize_course_name('  Счастье  (благотворительный) ')
+    'счастье благотворительный'
+    >>> normalize_course_name('YES!')
+    'yes'
+    >>> normalize_course_name('Счастье (online)')
+    'счастье онлайн'
+    """
+    words = COURSE_WORD_RE.findall(name.casefold().replace('ё', 'е'))
+    return ' '.join(COURSE_WORD_SYNONYMS.get(word, word) for word in words)
+
+
+class CourseClassifier:
+    """Определяет тип курса по названию
+
+    Из таблицы «название -> тип» строится префиксное дерево по словам
+    нормализованных названий, и в названии курса ищется самое длинное
+    совпадение с началом на границе слова. Так «Йога онлайн» - это йога,
+    «Счастье онлайн» - happiness_online (есть в таблице целиком), а лишние
+    пробелы, регистр и знаки препинания не мешают. Результаты запоминаются.
+    """
+
+    def __init__(self, name_type):
+        self._trie = {}
+        for name, course_type in name_type.items():
+            node = self._trie
+            for word in normalize_course_name(name).split():
+                node = node.setdefault(word, {})
+            node.setdefault(None, course_type)
+
+    @lru_cache(maxsize=None)
+    def classify(self, name):
+        """Возвращает тип курса или None, если название не опознано"""
+
+        words = normalize_course_name(name).split()
+        best_type, best_length = None, 0
+        for i in range(len(words)):
+            node = self._trie
+            for j in range(i, len(words)):
+                if (node := node.get(words[j])) is None:
+                    break
+                if None in node and j + 1 - i > best_length:
+                    best_type, best_length = node[None], j + 1 - i
+        return best_type
+
+
+# таблица важнее названий типов мероприятий: в ней могут быть уточнения
+COURSE_CLASSIFIER = CourseClassifier(COURSE_NAME_TYPE | {
+    et.value: et.name for et in EventType
+    if normalize_course_name(et.value) not in {normalize_course_name(n) for n in COURSE_NAME_TYPE}
+})
+
+
 def get_course_type(name, default='unknown'):
     """Возвращает тип курса по имени
 
     Используется при парсинге дата-файлов (JSON-файлов)/данных из админки
     """
-    return COURSE_NAME_TYPE.get(name.lower(), default)
+    return COURSE_CLASSIFIER.classify(name) or default
 
 
 def parse_dates(date_str, year):
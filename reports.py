@@ -0,0 +1,198 @@
+"""Отчеты по событиям: участники по типам, нагрузка учителей, загрузка мест
+
+Отчеты считаются на стороне MongoDB конвейерами агрегации, так что события
+не выгружаются в Python. Хранилище без агрегации (SQLite) считает то же
+самое по событиям периода. Результаты кешируются по периодам до изменения
+попадающих в период событий.
+
+    python reports.py teachers 2025
+    python reports.py participants 2026 --month 3
+"""
+import argparse
+from collections import defaultdict
+from datetime import datetime
+import threading
+
+from storage import open_storage
+
+
+def period(year, month=None):
+    """Интервал [начало, конец) года или месяца"""
+
+    if month is None:
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    if month == 12:
+        return datetime(year, 12, 1), datetime(year + 1, 1, 1)
+    return datetime(year, month, 1), datetime(year, month + 1, 1)
+
+
+def _match(start, end):
+    return {'$match': {'start_date': {'$gte': start, '$lt': end}}}
+
+
+# длительность события в днях и количество участников (оплат), если оно известно
+DAYS = {'$add': [{'$dateDiff': {'startDate': '$start_date', 'endDate': '$end_date', 'unit': 'day'}}, 1]}
+PARTICIPANTS = {'$ifNull': ['$num_payments', 0]}
+
+
+def _days(event):
+    return (event['end_date'] - event['start_date']).days + 1
+
+
+def _participants(event):
+    return event.get('num_payments') or 0
+
+
+def participants_pipeline(start, end):
+    return [
+        _match(start, end),
+        {'$group': {
+            '_id': {'year': {'$year': '$start_date'}, 'month': {'$month': '$start_date'}, 'type': '$type'},
+            'events': {'$sum': 1},
+            'participants': {'$sum': PARTICIPANTS},
+        }},
+        {'$project': {'_id': 0, 'year': '$_id.year', 'month': '$_id.month', 'type': '$_id.type',
+                      'events': 1, 'participants': 1}},
+        {'$sort': {'year': 1, 'month': 1, 'type': 1}},
+    ]
+
+
+def participants_rows(events, start, end):
+    rows = defaultdict(lambda: {'events': 0, 'participants': 0})
+    for event in events:
+        row = rows[(event['start_date'].year, event['start_date'].month, event['type'])]
+        row['events'] += 1
+        row['participants'] += _participants(event)
+    return [{'year': y, 'month': m, 'type': t} | row for (y, m, t), row in sorted(rows.items())]
+
+
+def teachers_pipeline(start, end):
+    return [
+        _match(start, end),
+        {'$unwind': '$teachers'},
+        {'$group': {
+            '_id': '$teachers',
+            'events': {'$sum': 1},
+            'days': {'$sum': DAYS},
+            'participants': {'$sum': PARTICIPANTS},
+        }},
+        {'$project': {'_id': 0, 'teacher': '$_id', 'events': 1, 'days': 1, 'participants': 1}},
+        {'$sort': {'days': -1, 'teacher': 1}},
+    ]
+
+
+def teachers_rows(events, start, end):
+    rows = defaultdict(lambda: {'events': 0, 'days': 0, 'participants': 0})
+    for event in events:
+        for teacher in event.get('teachers', []):
+            row = rows[teacher]
+            row['events'] += 1
+            row['days'] += _days(event)
+            row['participants'] += _participants(event)
+    rows = [{'teacher': teacher} | row for teacher, row in rows.items()]
+    return sorted(rows, key=lambda r: (-r['days'], r['teacher']))
+
+
+def places_pipeline(start, end):
+    period_days = (end - start).days
+    # дни периода, занятые событием (событие в конце периода может продолжаться в следующем)
+    busy = {'$filter': {
+        'input': {'$map': {'input': {'$range': [0, DAYS]}, 'as': 'd',
+                           'in': {'$dateAdd': {'startDate': '$start_date', 'unit': 'day', 'amount': '$$d'}}}},
+        'cond': {'$lt': ['$$this', end]},
+    }}
+    return [
+        _match(start, end),
+        {'$group': {
+            '_id': '$place',
+            'events': {'$sum': 1},
+            'days': {'$sum': DAYS},
+            'participants': {'$sum': PARTICIPANTS},
+            'busy': {'$push': busy},
+        }},
+        # пересекающиеся события в одном месте занимают день один раз
+        {'$set': {'busy_days': {'$size': {'$reduce': {
+            'input': '$busy', 'initialValue': [], 'in': {'$setUnion': ['$$value', '$$this']},
+        }}}}},
+        {'$project': {'_id': 0, 'place': '$_id', 'events': 1, 'days': 1, 'participants': 1, 'busy_days': 1,
+                      'share': {'$round': [{'$divide': ['$busy_days', period_days]}, 3]}}},
+        {'$sort': {'busy_days': -1, 'place': 1}},
+    ]
+
+
+def places_rows(events, start, end):
+    period_days = (end - start).days
+    rows = defaultdict(lambda: {'events': 0, 'days': 0, 'participants': 0})
+    busy = defaultdict(set)
+    for event in events:
+        row = rows[event['place']]
+        row['events'] += 1
+        row['days'] += _days(event)
+        row['participants'] += _participants(event)
+        busy[event['place']].update(d for d in range((event['start_date'] - start).days,
+                                                     (event['end_date'] - start).days + 1)
+                                    if d < period_days)
+    rows = [{'place': place} | row | {'busy_days': len(busy[place]),
+                                      'share': round(len(busy[place]) / period_days, 3)}
+            for place, row in rows.items()]
+    return sorted(rows, key=lambda r: (-r['busy_days'], r['place']))
+
+
+# имя отчета -> (конвейер агрегации, подсчет по событиям без агрегации)
+REPORTS = {
+    'participants': (participants_pipeline, participants_rows),
+    'teachers': (teachers_pipeline, teachers_rows),
+    'places': (places_pipeline, places_rows),
+}
+
+
+def build(storage, name, start, end):
+    """Считает отчет за период [start, end), возвращает список строк (словарей)"""
+
+    pipeline, rows = REPORTS[name]
+    result = storage.aggregate(pipeline(start, end))
+    if result is None:
+        return rows(storage.find_range(start, end), start, end)
+    return result
+
+
+class ReportCache:
+    """Кеш отчетов по периодам с инвалидацией при изменении событий периода"""
+
+    def __init__(self, get_storage):
+        self.get_storage = get_storage
+        self._reports = {}  # (имя, начало, конец) -> строки
+        self._lock = threading.Lock()
+
+    def get(self, name, start, end):
+        key = (name, start, end)
+        with self._lock:
+            if key not in self._reports:
+                self._reports[key] = build(self.get_storage(), name, start, end)
+            return self._reports[key]
+
+    def clear(self):
+        with self._lock:
+            self._reports = {}
+
+    def invalidate(self, events):
+        """Сбрасывает отчеты за периоды, в которые попадают события (нужны старые и новые версии)"""
+
+        dates = [e['start_date'] for e in events]
+        with self._lock:
+            self._reports = {
+                (name, start, end): rows for (name, start, end), rows in self._reports.items()
+                if not any(start <= d < end for d in dates)
+            }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Отчеты по событиям')
+    parser.add_argument('report', choices=REPORTS)
+    parser.add_argument('year', type=int)
+    parser.add_argument('--month', type=int)
+    args = parser.parse_args()
+
+    rows = build(open_storage(), args.report, *period(args.year, args.month))
+    for row in rows:
+        print(', '.join(f'{key}: {value}' for key, value in row.items()))
@@ -0,0 +1,97 @@
+"""Поиск событий по названию, учителям и месту
+
+Инвертированный индекс в памяти: слово -> идентификаторы событий. Слова
+приводятся к нижнему регистру, ё заменяется на е. Последнее слово запроса
+ищется по префиксу (для автодополнения), остальные тоже - по префиксу, так
+что «теат 17» найдет «Театральная, 17». Результаты упорядочены по близости
+даты события к сегодняшнему дню.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime
+import re
+import threading
+
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Разбивает текст на слова для индекса
+
+    >>> tokenize('Артиш Анжелика, Театральная, 17 (малый зал)')
+    ['артиш', 'анжелика', 'театральная', '17', 'малый', 'зал']
+    """
+    return WORD_RE.findall(text.casefold().replace('ё', 'е'))
+
+
+def event_tokens(event):
+    """Слова события: из названия, места и имен учителей"""
+
+    words = tokenize(event['name']) + tokenize(event['place'])
+    for teacher in event.get('teachers', []):
+        words.extend(tokenize(teacher))
+    return set(words)
+
+
+class SearchIndex:
+    def __init__(self):
+        self._postings = defaultdict(set)  # слово -> {_id, ...}
+        self._words = []  # отсортированный словарь для поиска по префиксу
+        self._events = {}  # _id -> событие
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._events)
+
+    def add(self, events):
+        with self._lock:
+            for event in events:
+                self._remove(event['_id'])
+                self._events[event['_id']] = event
+                for word in event_tokens(event):
+                    if word not in self._postings:
+                        insort(self._words, word)
+                    self._postings[word].add(event['_id'])
+
+    def remove(self, event_ids):
+        with self._lock:
+            for event_id in event_ids:
+                self._remove(event_id)
+
+    def _remove(self, event_id):
+        event = self._events.pop(event_id, None)
+        if event is None:
+            return
+        for word in event_tokens(event):
+            ids = self._postings[word]
+            ids.discard(event_id)
+            if not ids:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+
+    def _prefix_ids(self, prefix):
+        ids = set()
+        for i in range(bisect_left(self._words, prefix), len(self._words)):
+            word = self._words[i]
+            if not word.startswith(prefix):
+                break
+            ids |= self._postings[word]
+        return ids
+
+    def search(self, query, today=None, limit=20):
+        """Возвращает события, в которых есть все слова запроса (по префиксу)"""
+
+        words = tokenize(query)
+        if not words:
+            return []
+        today = today or datetime.now()
+
+        with self._lock:
+            # начинаем с самого редкого слова, чтобы пересекать маленькие множества
+            matches = sorted((self._prefix_ids(w) for w in words), key=len)
+            ids = set.intersection(*matches)
+            events = [self._events[i] for i in ids]
+
+        events.sort(key=lambda e: abs(e['start_date'] - today))
+        return events[:limit]
@@ -0,0 +1,200 @@
+"""Компактные бинарные снимки событий года для сборки статики без базы
+
+Снимок - колоночный файл: даты как смещения в днях от 1 января, строки
+(названия, места, учителя...) интернированы в общую таблицу, а события
+отсортированы по дате начала, так что события месяца - это непрерывный
+диапазон строк. Файл отображается в память (mmap), и декодируются только
+строки запрошенного месяца.
+
+Формат (little-endian), каждая секция выровнена на 4 байта:
+
+    заголовок    MAGIC, версия u16, год u16, событий u32, строк u32
+    месяцы       13 x u32 - номер первой строки каждого месяца и общее количество
+    start, end   u16 x N - дни от 1 января года
+    name, type, dates, place, time   u32 x N - номера строк (NONE - нет значения)
+    num_payments i32 x N (-1 - нет значения)
+    teachers     u32 x (N + 1) - смещения в списке учителей, затем u32 x M - номера строк
+    _id          12 байт x N
+    строки       u32 x (S + 1) - смещения, затем UTF-8
+
+    python snapshot.py 2025 2026 --dir snapshots/
+"""
+import argparse
+from array import array
+from datetime import datetime, timedelta
+import mmap
+from pathlib import Path
+import struct
+import sys
+
+from bson.objectid import ObjectId
+
+from storage import open_storage
+
+
+MAGIC = b'AOLS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+NONE = 0xFFFFFFFF
+STRING_FIELDS = ('name', 'type', 'dates', 'place', 'time')
+
+
+def _pad(data):
+    return data + b'\0' * (-len(data) % 4)
+
+
+def _array(typecode, values):
+    arr = array(typecode, values)
+    if sys.byteorder != 'little':
+        arr.byteswap()
+    return _pad(arr.tobytes())
+
+
+def dump(events, year):
+    """Кодирует события года (начинающиеся в этом году) в снимок"""
+
+    events = sorted(events, key=lambda e: e['start_date'])
+    jan1 = datetime(year, 1, 1)
+
+    strings = {}
+
+    def intern(value):
+        if value is None:
+            return NONE
+        return strings.setdefault(value, len(strings))
+
+    months = [0] * 13
+    for e in events:
+        months[e['start_date'].month] += 1
+    for m in range(1, 13):
+        months[m] += months[m - 1]
+
+    columns = {field: [intern(e.get(field)) for e in events] for field in STRING_FIELDS}
+    teacher_offsets = [0]
+    teachers = []
+    for e in events:
+        teachers.extend(intern(t) for t in e.get('teachers', []))
+        teacher_offsets.append(len(teachers))
+
+    blob = b''.join(s.encode() for s in strings)
+    string_offsets = [0]
+    for s in strings:
+        string_offsets.append(string_offsets[-1] + len(s.encode()))
+
+    parts = [
+        HEADER.pack(MAGIC, VERSION, year, len(events), len(strings)),
+        _array('I', months),
+        _array('H', [(e['start_date'] - jan1).days for e in events]),
+        _array('H', [(e['end_date'] - jan1).days for e in events]),
+        *(_array('I', columns[field]) for field in STRING_FIELDS),
+        _array('i', [e.get('num_payments') if e.get('num_payments') is not None else -1 for e in events]),
+        _array('I', teacher_offsets),
+        _array('I', teachers),
+        _pad(b''.join(ObjectId(e['_id']).binary for e in events)),
+        _array('I', string_offsets),
+        blob,
+    ]
+    return b''.join(parts)
+
+
+class Snapshot:
+    """Снимок года, открытый только для чтения
+
+    События декодируются лениво, по месяцам.
+    """
+
+    def __init__(self, path):
+        if sys.byteorder != 'little':
+            raise NotImplementedError('Снимки читаются только на little-endian платформах')
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.year, n, n_strings = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f'{path} - не снимок событий')
+        if version != VERSION:
+            raise ValueError(f'Версия снимка {path} {version}, поддерживается {VERSION}')
+
+        self._jan1 = datetime(self.year, 1, 1)
+        self._view = memoryview(self._mm)
+        self._pos = HEADER.size
+        self._months = self._take('I', 13)
+        self._start = self._take('H', n)
+        self._end = self._take('H', n)
+        self._strings_columns = {field: self._take('I', n) for field in STRING_FIELDS}
+        self._num_payments = self._take('i', n)
+        self._teacher_offsets = self._take('I', n + 1)
+        self._teachers = self._take('I', self._teacher_offsets[n])
+        self._ids = self._take('B', 12 * n)
+        self._string_offsets = self._take('I', n_strings + 1)
+        self._blob = self._view[self._pos:]
+        self._decoded = {}
+
+    def _take(self, fmt, count):
+        size = struct.calcsize(fmt) * count
+        section = self._view[self._pos:self._pos + size].cast(fmt)
+        self._pos += size + (-size % 4)
+        return section
+
+    def __len__(self):
+        return self._months[12]
+
+    def _string(self, index):
+        if index == NONE:
+            return None
+        if index not in self._decoded:
+            start, end = self._string_offsets[index], self._string_offsets[index + 1]
+            self._decoded[index] = bytes(self._blob[start:end]).decode()
+        return self._decoded[index]
+
+    def _event(self, i):
+        event = {
+            '_id': ObjectId(bytes(self._ids[12 * i:12 * i + 12])),
+            'start_date': self._jan1 + timedelta(days=self._start[i]),
+            'end_date': self._jan1 + timedelta(days=self._end[i]),
+        }
+        for field, column in self._strings_columns.items():
+            if (value := self._string(column[i])) is not None:
+                event[field] = value
+        teachers = self._teachers[self._teacher_offsets[i]:self._teacher_offsets[i + 1]]
+        if len(teachers):
+            event['teachers'] = [self._string(t) for t in teachers]
+        if self._num_payments[i] >= 0:
+            event['num_payments'] = self._num_payments[i]
+        return event
+
+    def month_events(self, month):
+        """События, начинающиеся в месяце"""
+        return [self._event(i) for i in range(self._months[month - 1], self._months[month])]
+
+    def events(self):
+        return [self._event(i) for i in range(len(self))]
+
+
+def snapshot_path(snapshot_dir, year):
+    return Path(snapshot_dir) / f'{year}.snap'
+
+
+def snapshot_years(snapshot_dir):
+    """Годы, для которых в папке есть снимки"""
+    return sorted(int(path.stem) for path in Path(snapshot_dir).glob('*.snap'))
+
+
+def export(storage, year, snapshot_dir):
+    """Записывает снимок событий года из хранилища, возвращает количество событий"""
+
+    events = storage.find_range(datetime(year, 1, 1), datetime(year + 1, 1, 1))
+    path = snapshot_path(snapshot_dir, year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(dump(events, year))
+    return len(events)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Экспорт снимков событий по годам')
+    parser.add_argument('years', nargs='+', type=int)
+    parser.add_argument('--dir', default='snapshots', help='папка для снимков')
+    args = parser.parse_args()
+
+    storage = open_storage()
+    for year in args.years:
+        print(f'{year}: {export(storage, year, args.dir)} событий')
@@ -0,0 +1,472 @@
+"""Хранилища событий
+
+Приложение и сборщик статики работают с событиями через общий интерфейс
+`Storage`, за которым может быть MongoDB или встроенная база SQLite.
+Хранилище выбирается по URL:
+
+    mongodb://127.0.0.1:27017/aol_calendar
+    sqlite:///data/calendar.db
+"""
+import abc
+import asyncio
+from datetime import datetime
+import os
+import sqlite3
+import threading
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, MongoClient
+from pymongo.errors import OperationFailure
+
+import codec
+
+
+DEFAULT_URL = 'mongodb://127.0.0.1:27017/aol_calendar'
+DEFAULT_DBNAME = 'aol_calendar'
+
+# поля, по которым можно отбирать события для массовых операций
+CRITERIA_FIELDS = ('series_id', 'type', 'place')
+
+
+def timestamp():
+    """Текущее время для `updated_at` с точностью до миллисекунд, как его хранит BSON
+
+    Иначе `updated_at`, прочитанный из MongoDB, не совпадет с тем, что записали.
+
+    >>> import bson
+    >>> stamp = timestamp()
+    >>> bson.decode(bson.encode({'updated_at': stamp}))['updated_at'] == stamp
+    True
+    """
+    now = datetime.now()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+class Storage(abc.ABC):
+    """Интерфейс хранилища событий
+
+    События - словари с обязательными ключами `start_date` и `end_date` (datetime).
+    Идентификатор события - `_id` (ObjectId) во всех реализациях.
+
+    Массовые операции принимают критерии отбора - словарь с необязательными
+    ключами из CRITERIA_FIELDS (точное совпадение поля) и `start`/`end`
+    (дата начала события в интервале [start, end)).
+    """
+
+    @abc.abstractmethod
+    def find_range(self, start=None, end=None):
+        """Возвращает события, начинающиеся в интервале [start, end), по возрастанию даты начала
+
+        Если граница не задана, то интервал с этой стороны не ограничен.
+        """
+
+    @abc.abstractmethod
+    def find_one(self, event_id):
+        """Возвращает событие по идентификатору или None"""
+
+    @abc.abstractmethod
+    def insert_many(self, events):
+        """Добавляет события, возвращает список их идентификаторов
+
+        Если у события уже есть `_id`, то он сохраняется (нужно для миграции).
+        """
+
+    @abc.abstractmethod
+    def replace(self, event_id, event):
+        """Заменяет событие целиком"""
+
+    @abc.abstractmethod
+    def distinct(self, field):
+        """Возвращает уникальные значения поля (элементы списков разворачиваются)"""
+
+    @abc.abstractmethod
+    def count(self, criteria=None):
+        """Возвращает количество событий, подходящих под критерии"""
+
+    @abc.abstractmethod
+    def date_range(self):
+        """Возвращает (самая ранняя, самая поздняя) дату начала событий или None, если событий нет"""
+
+    @abc.abstractmethod
+    def find_many(self, criteria):
+        """Возвращает события, подходящие под критерии, по возрастанию даты начала"""
+
+    @abc.abstractmethod
+    def update_many(self, criteria, changes):
+        """Меняет поля событий, подходящих под критерии, возвращает количество измененных
+
+        Поле со значением None удаляется из события.
+        """
+
+    @abc.abstractmethod
+    def delete_many(self, criteria):
+        """Удаляет события, подходящие под критерии, возвращает количество удаленных"""
+
+    @abc.abstractmethod
+    def changed_since(self, since=None):
+        """Возвращает события, у которых `updated_at` позже since, по возрастанию `updated_at`"""
+
+    def watch(self, timeout=1.0):
+        """Подписывается на изменения событий
+
+        Возвращает итератор пар (идентификатор, событие), для удаленного события
+        вместо него None. Если за timeout секунд изменений не было, итератор
+        выдает None, чтобы вызывающий код мог заняться своими делами.
+        Если хранилище не умеет уведомлять об изменениях - возвращает None.
+        """
+        return None
+
+    def aggregate(self, pipeline):
+        """Выполняет конвейер агрегации MongoDB над событиями, возвращает список результатов
+
+        Если хранилище не умеет агрегировать на своей стороне - возвращает None.
+        """
+        return None
+
+    @abc.abstractmethod
+    def get_layout(self, year, month):
+        """Возвращает сохраненную раскладку месяца (список блоков событий) или None"""
+
+    @abc.abstractmethod
+    def save_layout(self, year, month, blocks):
+        """Сохраняет раскладку месяца"""
+
+
+class MongoStorage(Storage):
+    """События в коллекции `events` базы MongoDB"""
+
+    def __init__(self, url=DEFAULT_URL, dbname=DEFAULT_DBNAME):
+        self.client = MongoClient(url)
+        self.db = self.client.get_default_database(dbname)
+        self.events = self.db['events']
+        self.events.create_index([('updated_at', ASCENDING)])
+        self.events.create_index([('series_id', ASCENDING)], sparse=True)
+        # начинается со start_date, поэтому заменяет и отдельный индекс по дате для выборок по периодам;
+        # покрывает отчеты по участникам и местам (агрегация не читает сами документы),
+        # отчету по учителям нужно поле teachers, которого в индексе нет
+        self.events.create_index([('start_date', ASCENDING), ('type', ASCENDING), ('place', ASCENDING),
+                                  ('end_date', ASCENDING), ('num_payments', ASCENDING)])
+        self.month_layouts = self.db['month_layouts']
+        self.month_layouts.create_index([('year', ASCENDING), ('month', ASCENDING)], unique=True)
+
+    def _query(self, criteria):
+        query = {field: criteria[field] for field in CRITERIA_FIELDS if criteria.get(field)}
+        dates = {}
+        if criteria.get('start') is not None:
+            dates['$gte'] = criteria['start']
+        if criteria.get('end') is not None:
+            dates['$lt'] = criteria['end']
+        if dates:
+            query['start_date'] = dates
+        return query
+
+    def find_range(self, start=None, end=None):
+        return self.find_many({'start': start, 'end': end})
+
+    def find_many(self, criteria):
+        return [e for e in self.events.find(self._query(criteria)).sort('start_date', ASCENDING)]
+
+    def find_one(self, event_id):
+        return self.events.find_one({'_id': ObjectId(event_id)})
+
+    def insert_many(self, events):
+        events = list(events)
+        if not events:
+            return []
+        return self.events.insert_many(events).inserted_ids
+
+    def replace(self, event_id, event):
+        self.events.replace_one({'_id': ObjectId(event_id)}, event)
+
+    def distinct(self, field):
+        return self.events.distinct(field)
+
+    def count(self, criteria=None):
+        return self.events.count_documents(self._query(criteria or {}))
+
+    def date_range(self):
+        # по индексу start_date с обоих концов, без просмотра коллекции
+        first = self.events.find_one({}, {'start_date': 1}, sort=[('start_date', ASCENDING)])
+        if first is None:
+            return None
+        last = self.events.find_one({}, {'start_date': 1}, sort=[('start_date', DESCENDING)])
+        return first['start_date'], last['start_date']
+
+    def update_many(self, criteria, changes):
+        update = {'$set': {k: v for k, v in changes.items() if v is not None}}
+        if unset := {k: '' for k, v in changes.items() if v is None}:
+            update['$unset'] = unset
+        return self.events.update_many(self._query(criteria), update).modified_count
+
+    def delete_many(self, criteria):
+        return self.events.delete_many(self._query(criteria)).deleted_count
+
+    def changed_since(self, since=None):
+        query = {'updated_at': {'$gt': since}} if since else {'updated_at': {'$exists': True}}
+        return [e for e in self.events.find(query).sort('updated_at', ASCENDING)]
+
+    def watch(self, timeout=1.0):
+        try:
+            # change streams работают только на replica set, на одиночном сервере будет ошибка
+            stream = self.events.watch(full_document='updateLookup', max_await_time_ms=int(timeout * 1000))
+        except OperationFailure:
+            return None
+        return self._iter_changes(stream)
+
+    def _iter_changes(self, stream):
+        with stream:
+            while stream.alive:
+                change = stream.try_next()
+                if change is None:
+                    yield None
+                else:
+                    yield change['documentKey']['_id'], change.get('fullDocument')
+
+    def aggregate(self, pipeline):
+        return list(self.events.aggregate(pipeline))
+
+    def get_layout(self, year, month):
+        layout = self.month_layouts.find_one({'year': year, 'month': month})
+        return layout['blocks'] if layout else None
+
+    def save_layout(self, year, month, blocks):
+        self.month_layouts.replace_one(
+            {'year': year, 'month': month},
+            {'year': year, 'month': month, 'blocks': blocks},
+            upsert=True
+        )
+
+
+class SQLiteStorage(Storage):
+    """События во встроенной базе SQLite
+
+    Документ события хранится в JSON, а даты начала и конца вынесены в отдельные
+    индексированные колонки (ISO-строки сравниваются так же, как даты).
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS events (
+        id TEXT PRIMARY KEY,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        doc TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS events_start_date ON events (start_date);
+    CREATE INDEX IF NOT EXISTS events_end_date ON events (end_date);
+    CREATE INDEX IF NOT EXISTS events_updated_at ON events (json_extract(doc, '$.updated_at."$date"'));
+    CREATE INDEX IF NOT EXISTS events_series_id ON events (json_extract(doc, '$.series_id'));
+    CREATE TABLE IF NOT EXISTS month_layouts (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        blocks TEXT NOT NULL,
+        PRIMARY KEY (year, month)
+    );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # у каждого потока (flask обрабатывает запросы в потоках) свое соединение
+        self._local = threading.local()
+        self._conn.executescript(self.SCHEMA)
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path)
+        return conn
+
+    def _dump(self, event):
+        doc = {k: v for k, v in event.items() if k != '_id'}
+        return codec.dumps(doc)
+
+    def _load(self, row):
+        event_id, doc = row
+        return {'_id': ObjectId(event_id)} | codec.loads(doc)
+
+    def _where(self, criteria):
+        clauses = []
+        params = []
+        for field in CRITERIA_FIELDS:
+            if criteria.get(field):
+                clauses.append(f"json_extract(doc, '$.{field}') = ?")
+                params.append(criteria[field])
+        if criteria.get('start') is not None:
+            clauses.append('start_date >= ?')
+            params.append(criteria['start'].isoformat())
+        if criteria.get('end') is not None:
+            clauses.append('start_date < ?')
+            params.append(criteria['end'].isoformat())
+        return ' AND '.join(clauses) or '1', params
+
+    def find_range(self, start=None, end=None):
+        return self.find_many({'start': start, 'end': end})
+
+    def find_many(self, criteria):
+        where, params = self._where(criteria)
+        rows = self._conn.execute(f'SELECT id, doc FROM events WHERE {where} ORDER BY start_date', params)
+        return [self._load(row) for row in rows]
+
+    def find_one(self, event_id):
+        row = self._conn.execute('SELECT id, doc FROM events WHERE id = ?', (str(ObjectId(event_id)),)).fetchone()
+        return self._load(row) if row else None
+
+    def insert_many(self, events):
+        ids = []
+        rows = []
+        for e in events:
+            # как и pymongo, дописываем идентификатор в сам документ
+            event_id = e.setdefault('_id', ObjectId())
+            ids.append(event_id)
+            rows.append((str(event_id), e['start_date'].isoformat(), e['end_date'].isoformat(), self._dump(e)))
+
+        with self._conn as conn:
+            conn.executemany('INSERT INTO events (id, start_date, end_date, doc) VALUES (?, ?, ?, ?)', rows)
+        return ids
+
+    def replace(self, event_id, event):
+        with self._conn as conn:
+            conn.execute(
+                'UPDATE events SET start_date = ?, end_date = ?, doc = ? WHERE id = ?',
+                (event['start_date'].isoformat(), event['end_date'].isoformat(), self._dump(event),
+                 str(ObjectId(event_id)))
+            )
+
+    def distinct(self, field):
+        # json_each разворачивает массивы (как distinct в MongoDB), а для скаляра вернет одно значение
+        rows = self._conn.execute(
+            'SELECT DISTINCT j.value FROM events, json_each(events.doc, ?) AS j',
+            (f'$.{field}',)
+        )
+        return [value for value, in rows]
+
+    def count(self, criteria=None):
+        where, params = self._where(criteria or {})
+        return self._conn.execute(f'SELECT count(*) FROM events WHERE {where}', params).fetchone()[0]
+
+    def date_range(self):
+        first, last = self._conn.execute('SELECT min(start_date), max(start_date) FROM events').fetchone()
+        if first is None:
+            return None
+        return datetime.fromisoformat(first), datetime.fromisoformat(last)
+
+    def update_many(self, criteria, changes):
+        rows = []
+        for event in self.find_many(criteria):
+            for field, value in changes.items():
+                if value is None:
+                    event.pop(field, None)
+                else:
+                    event[field] = value
+            rows.append((event['start_date'].isoformat(), event['end_date'].isoformat(), self._dump(event),
+                         str(event['_id'])))
+
+        with self._conn as conn:
+            conn.executemany('UPDATE events SET start_date = ?, end_date = ?, doc = ? WHERE id = ?', rows)
+        return len(rows)
+
+    def delete_many(self, criteria):
+        where, params = self._where(criteria)
+        with self._conn as conn:
+            return conn.execute(f'DELETE FROM events WHERE {where}', params).rowcount
+
+    def changed_since(self, since=None):
+        updated_at = """json_extract(doc, '$.updated_at."$date"')"""
+        rows = self._conn.execute(
+            f'SELECT id, doc FROM events WHERE {updated_at} > ? ORDER BY {updated_at}',
+            (since.isoformat() if since else '',)
+        )
+        return [self._load(row) for row in rows]
+
+    def get_layout(self, year, month):
+        row = self._conn.execute('SELECT blocks FROM month_layouts WHERE year = ? AND month = ?', (year, month)).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def save_layout(self, year, month, blocks):
+        with self._conn as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO month_layouts (year, month, blocks) VALUES (?, ?, ?)',
+                (year, month, codec.dumps(blocks))
+            )
+
+
+class AsyncMongoStorage:
+    """Асинхронный вариант MongoStorage для асинхронного режима приложения
+
+    Реализует только то, что нужно для обработки запросов. Индексы создает MongoStorage.
+    """
+
+    def __init__(self, url=DEFAULT_URL, dbname=DEFAULT_DBNAME):
+        self.client = AsyncMongoClient(url)
+        self.db = self.client.get_default_database(dbname)
+        self.events = self.db['events']
+        self.month_layouts = self.db['month_layouts']
+
+    async def find_range(self, start=None, end=None):
+        query = {}
+        if start is not None:
+            query['$gte'] = start
+        if end is not None:
+            query['$lt'] = end
+        cursor = self.events.find({'start_date': query} if query else {}).sort('start_date', ASCENDING)
+        return [e async for e in cursor]
+
+    async def find_one(self, event_id):
+        return await self.events.find_one({'_id': ObjectId(event_id)})
+
+    async def insert_many(self, events):
+        events = list(events)
+        if not events:
+            return []
+        return (await self.events.insert_many(events)).inserted_ids
+
+    async def replace(self, event_id, event):
+        await self.events.replace_one({'_id': ObjectId(event_id)}, event)
+
+    async def get_layout(self, year, month):
+        layout = await self.month_layouts.find_one({'year': year, 'month': month})
+        return layout['blocks'] if layout else None
+
+    async def save_layout(self, year, month, blocks):
+        await self.month_layouts.replace_one(
+            {'year': year, 'month': month},
+            {'year': year, 'month': month, 'blocks': blocks},
+            upsert=True
+        )
+
+
+class ThreadedAsyncStorage:
+    """Асинхронная обертка над синхронным хранилищем: методы выполняются в потоках"""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __getattr__(self, name):
+        method = getattr(self.storage, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+def open_storage(url=None):
+    """Открывает хранилище по URL (по умолчанию из переменной окружения STORAGE_URL)"""
+
+    url = url or os.environ.get('STORAGE_URL') or DEFAULT_URL
+    if url.startswith(('mongodb://', 'mongodb+srv://')):
+        return MongoStorage(url)
+    if url.startswith('sqlite:///'):
+        return SQLiteStorage(url.removeprefix('sqlite:///'))
+    raise ValueError(f'Неизвестное хранилище: {url}')
+
+
+def open_async_storage(url=None):
+    """Открывает хранилище для асинхронного кода
+
+    Для MongoDB - с асинхронным драйвером, остальные хранилища работают в потоках.
+    """
+    url = url or os.environ.get('STORAGE_URL') or DEFAULT_URL
+    if url.startswith(('mongodb://', 'mongodb+srv://')):
+        return AsyncMongoStorage(url)
+    return ThreadedAsyncStorage(open_storage(url))
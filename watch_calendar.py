@@ -0,0 +1,173 @@
+"""Демон, пересобирающий статические страницы при изменении событий
+
+Подписывается на change streams коллекции `events` (нужен replica set), а если
+они недоступны - опрашивает события по индексу `updated_at`. Изменения,
+пришедшие пачкой, накапливаются и применяются разом через debounce секунд
+после последнего изменения. Заново запрашиваются только затронутые месяцы
+и перерисовываются только страницы затронутых годов.
+
+    python watch_calendar.py --debounce 2 --poll 10
+"""
+import argparse
+import logging
+import time
+
+from app import FILTERS, get_storage
+from archive import Archive, discover_years
+import layouts
+from make_calendar import OUTPUT_DIR, get_month_data, write_archived_nav, write_feeds, write_year_pages
+
+
+logger = logging.getLogger(__name__)
+
+
+class YearPages:
+    """Страницы годов с данными по месяцам, которые можно обновлять частично"""
+
+    def __init__(self, storage, years=None, output_dir=OUTPUT_DIR):
+        self.storage = storage
+        self.years = years or discover_years(storage)
+        self.output_dir = output_dir
+        self.archive = Archive(output_dir)
+        self.calendar_data = {}
+        # в каком (год, месяц) сейчас лежит событие, чтобы знать, откуда оно ушло
+        # при переносе на другую дату или удалении
+        self.locations = {}
+        self.dirty = set()
+
+    def build_all(self):
+        """Полная сборка всех страниц, с которой начинается работа демона"""
+
+        self.resync()
+        for year in self.years:
+            if self._load_year(year):
+                write_year_pages(year, self.calendar_data[year], self.years, self.output_dir)
+            else:
+                write_archived_nav(self.archive, year, self.years)
+        write_feeds(self.output_dir)
+        self.dirty.clear()
+
+    def _load_year(self, year):
+        """Запрашивает данные месяцев года, возвращает False, если год в архиве"""
+
+        # архивные годы не пересобираются (и изменения в них не отслеживаются)
+        if self.archive.is_year_frozen(year, [f.name for f in FILTERS]):
+            return False
+        self.calendar_data[year] = [get_month_data(year, month) for month in range(1, 12+1)]
+        return True
+
+    def resync(self):
+        """Перечитывает расположение всех событий, помечая месяцы исчезнувших событий"""
+
+        locations = {e['_id']: (e['start_date'].year, e['start_date'].month) for e in self.storage.find_range()}
+        for event_id in self.locations.keys() - locations.keys():
+            self.dirty.add(self.locations[event_id])
+        self.locations = locations
+
+    def mark(self, event_id, event):
+        """Помечает месяцы, затронутые изменением события (event=None - событие удалено)"""
+
+        if event_id in self.locations:
+            self.dirty.add(self.locations.pop(event_id))
+        if event is not None:
+            location = (event['start_date'].year, event['start_date'].month)
+            self.locations[event_id] = location
+            self.dirty.add(location)
+
+    def flush(self):
+        """Пересобирает затронутые месяцы и записывает страницы их годов"""
+
+        # раскладки обновляет и тот, кто записал события, но change stream может
+        # прийти раньше, чем он это сделает
+        layouts.rebuild(self.storage, self.dirty)
+
+        years = set()
+        discovered = discover_years(self.storage)
+        if discovered != self.years:
+            # появился или исчез год: у новых годов еще нет страниц,
+            # а навигация по годам есть на каждой странице
+            self.years = discovered
+            self.calendar_data = {year: data for year, data in self.calendar_data.items() if year in self.years}
+            years.update(self.calendar_data)
+            for year in self.years:
+                if year in self.calendar_data:
+                    continue
+                if self._load_year(year):
+                    years.add(year)
+                else:
+                    write_archived_nav(self.archive, year, self.years)
+
+        for year, month in sorted(self.dirty):
+            if year not in self.calendar_data:
+                continue
+            self.calendar_data[year][month - 1] = get_month_data(year, month)
+            years.add(year)
+        self.dirty.clear()
+
+        for year in sorted(years):
+            write_year_pages(year, self.calendar_data[year], self.years, self.output_dir)
+        write_feeds(self.output_dir)
+        return years
+
+
+def poll_changes(storage, pages, since, interval):
+    """Изменения событий по индексу updated_at, для хранилищ без change streams
+
+    Удаление по updated_at не увидеть, поэтому если событий стало меньше,
+    чем известно, перечитываем их расположение целиком.
+    """
+    while True:
+        changed = storage.changed_since(since)
+        for e in changed:
+            since = e['updated_at']
+            yield e['_id'], e
+
+        if storage.count() < len(pages.locations):
+            pages.resync()
+
+        yield None
+        time.sleep(interval)
+
+
+def watch(storage, pages, debounce=2.0, poll_interval=10.0, max_delay=30.0):
+    pages.build_all()
+
+    changes = storage.watch(timeout=debounce)
+    if changes is None:
+        since = max((e['updated_at'] for e in storage.changed_since()), default=None)
+        changes = poll_changes(storage, pages, since, poll_interval)
+        logger.info('Change streams недоступны, опрашиваем базу каждые %s с', poll_interval)
+    else:
+        logger.info('Слушаем change streams')
+
+    first_change = last_change = None
+    for change in changes:
+        now = time.monotonic()
+        if change is not None:
+            pages.mark(*change)
+            last_change = now
+            first_change = first_change or now
+
+        if not pages.dirty:
+            continue
+        if last_change is None:
+            # месяцы удаленных событий, найденные при resync
+            first_change = last_change = now
+        # ждем затишья, но не дольше max_delay, если изменения идут непрерывно
+        if now - last_change >= debounce or now - first_change >= max_delay:
+            years = pages.flush()
+            logger.info('Пересобраны страницы: %s', ', '.join(map(str, years)) or '-')
+            first_change = last_change = None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пересборка статических страниц при изменении событий')
+    parser.add_argument('--debounce', type=float, default=2.0, help='сколько секунд ждать затишья после изменения')
+    parser.add_argument('--poll', type=float, default=10.0, help='интервал опроса базы без change streams')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level='INFO')
+
+    storage = get_storage()
+    watch(storage, YearPages(storage, output_dir=args.output_dir), args.debounce, args.poll)